@@ -0,0 +1,78 @@
+"""Startup budget of the non-inference CLI paths: usage, dry runs and cache commands never load the model stack"""
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'transcribe.py'
+# Wall time of a whole CLI call, interpreter start included
+STARTUP_BUDGET = 2.0
+HEAVY_MODULES = ('faster_whisper', 'ctranslate2', 'torch')
+
+# Runs the CLI in-process and reports every attempt to import a heavy module, installed or not
+CHILD = '''
+import json, runpy, sys
+attempted = set()
+class Guard:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] in {heavy!r}:
+            attempted.add(name)
+        return None
+sys.meta_path.insert(0, Guard())
+sys.argv = {argv!r}
+try:
+    runpy.run_path({script!r}, run_name='__main__')
+except SystemExit:
+    pass
+except ImportError:
+    # A heavy module that is not installed here still counts as imported
+    pass
+attempted |= {{name for name in sys.modules if name.split('.')[0] in {heavy!r}}}
+print('STARTUP-RESULT ' + json.dumps(sorted(attempted)))
+'''
+
+
+def run_cli(*args: str) -> tuple[float, list[str]]:
+    code = CHILD.format(heavy=HEAVY_MODULES, argv=[str(SCRIPT), *args], script=str(SCRIPT))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60)
+    elapsed = time.perf_counter() - start
+    result = [line for line in completed.stdout.splitlines() if line.startswith('STARTUP-RESULT ')]
+    if not result:
+        raise AssertionError(f'CLI did not finish:\n{completed.stdout}\n{completed.stderr}')
+    return elapsed, json.loads(result[-1].split(' ', 1)[1])
+
+
+class StartupTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.directory = Path(temp.name)
+        for name in ('a.wav', 'b.mp3', 'nested/c.flac'):
+            path = self.directory / 'audio' / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'\0' * 1024)
+
+    def assert_fast_and_light(self, *args: str):
+        elapsed, heavy = run_cli(*args)
+        self.assertEqual(heavy, [], f'{args} imported {heavy}')
+        self.assertLess(elapsed, STARTUP_BUDGET, f'{args} took {elapsed:.2f}s')
+
+    def test_usage(self):
+        self.assert_fast_and_light()
+
+    def test_dry_run_file(self):
+        self.assert_fast_and_light(str(self.directory / 'audio' / 'a.wav'), '--dry-run')
+
+    def test_dry_run_directory(self):
+        self.assert_fast_and_light(str(self.directory / 'audio'), str(self.directory / 'out'), '--dry-run')
+
+    def test_cache_stats(self):
+        self.assert_fast_and_light('--cache-stats', '--cache-dir', str(self.directory / 'cache'))
+
+
+if __name__ == '__main__':
+    unittest.main()
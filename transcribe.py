@@ -4,19 +4,33 @@ Russian audio transcription using faster-whisper
 Optimized for best performance with Russian language audio
 Supports processing individual files or entire directories
 '''
-from typing import Iterable, Tuple
+from typing import Callable, Iterable, Iterator, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+import multiprocessing
+import queue
 import warnings
 import subprocess
 import shutil
-import tempfile
 import hashlib
+import re
+import socket
+from contextlib import contextmanager, nullcontext
+import uuid
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
 
+# faster_whisper (and with it ctranslate2) is imported where a model or decoder is needed:
+# help, --dry-run, cache commands and diagnostics should start without it
 warnings.filterwarnings('ignore', category=UserWarning, module='ctranslate2')
-from faster_whisper import WhisperModel
 import time
 import sys
 import os
-import glob
+import numpy as np
 import soundfile as sf
 from pathlib import Path
 from rich.console import Console, Group
@@ -25,26 +39,777 @@ from rich.text import Text
 from rich.live import Live
 
 
+SAMPLE_RATE = 16000
+SUPPORTED_EXTENSIONS = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
+DEFAULT_CACHE_SIZE = 10 * 1024**3
+# Bytes read from each end of a file for content fingerprints
+CONTENT_KEY_BYTES = 4 * 1024 * 1024
+# Speech timestamp files are a few KB each, the VAD cache is bounded by count with LRU eviction
+DEFAULT_VAD_CACHE_ENTRIES = 20000
+# Cached speech regions closer than this are decoded as one clip
+VAD_MERGE_GAP = 2.0
+DEFAULT_SERVER_HOST = '127.0.0.1'
+DEFAULT_SERVER_PORT = 8765
+# Files shorter than this are not worth splitting into parallel chunks
+CHUNKED_MIN_DURATION = 600
+# Files longer than this (seconds) are decoded window by window instead of as one array
+DEFAULT_STREAM_THRESHOLD = 3 * 3600
+STREAM_WINDOW = 600
+# Draft segments crossing any of these are decoded again with the main model in --cascade mode
+CASCADE_THRESHOLDS = {'avg_logprob': -0.8, 'compression_ratio': 2.4, 'no_speech_prob': 0.5}
+
+
 class UnsupportedAudioFormatError(RuntimeError):
     pass
 
 
+class DecodedAudioInfo:
+    """Duration info for audio decoded into memory, mirrors the fields of soundfile's info"""
+    def __init__(self, frames: int, samplerate: int = SAMPLE_RATE):
+        self.frames = frames
+        self.samplerate = samplerate
+        self.channels = 1
+        self.duration = frames / samplerate
+
+
+def content_fingerprint(audio_file: Path) -> str:
+    """Hash of size and the first and last few MB of content, so copies of a file get the same key"""
+    size = audio_file.stat().st_size
+    digest = hashlib.sha1(str(size).encode())
+    with open(audio_file, 'rb') as f:
+        digest.update(f.read(CONTENT_KEY_BYTES))
+        # Files shorter than two blocks still hash their tail, the overlap with the head is harmless
+        if size > CONTENT_KEY_BYTES:
+            f.seek(-CONTENT_KEY_BYTES, os.SEEK_END)
+            digest.update(f.read(CONTENT_KEY_BYTES))
+    return digest.hexdigest()
+
+
+def probe_duration(audio_file: Path) -> float | None:
+    """Duration in seconds from the file header (soundfile, then ffprobe) without decoding the audio"""
+    try:
+        return sf.info(str(audio_file)).duration
+    except sf.LibsndfileError:
+        pass
+    ffprobe_path = shutil.which('ffprobe')
+    if not ffprobe_path:
+        return None
+    completed = subprocess.run(
+        [ffprobe_path, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', str(audio_file)],
+        capture_output=True, text=True)
+    try:
+        return float(completed.stdout.strip())
+    except ValueError:
+        return None
+
+
+class WavCache:
+    """Shared cache of WAV files converted by ffmpeg, limited in size with LRU eviction"""
+    def __init__(self, directory: Path | None = None, max_bytes: int = DEFAULT_CACHE_SIZE, content_keys: bool = True):
+        self.directory = Path(directory) if directory else self.default_directory()
+        self.max_bytes = max_bytes
+        self.content_keys = content_keys
+
+    @staticmethod
+    def default_directory() -> Path:
+        if os.environ.get('RUSSIAN_WHISPER_CACHE_DIR'):
+            return Path(os.environ['RUSSIAN_WHISPER_CACHE_DIR'])
+        if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+            return Path(os.environ['LOCALAPPDATA']) / 'russian-whisper' / 'cache'
+        return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'russian-whisper'
+
+    def key(self, audio_file: Path) -> str:
+        if not self.content_keys:
+            stat = audio_file.stat()
+            return hashlib.sha1(f'{audio_file.resolve()}|{stat.st_size}|{stat.st_mtime_ns}'.encode('utf-8', errors='ignore')).hexdigest()
+        return content_fingerprint(audio_file)
+
+    def lookup(self, key: str) -> Path | None:
+        path = self.directory / f'{key}.wav'
+        try:
+            # Refresh mtime, eviction removes the least recently used entries first
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def temp_path(self, key: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory / f'.{key}.{os.getpid()}.{threading.get_ident()}.tmp.wav'
+
+    def store(self, key: str, temp_path: Path) -> Path:
+        """Move a finished conversion into the cache and evict old entries over the size limit"""
+        path = self.directory / f'{key}.wav'
+        # Atomic rename: concurrent workers converting the same file just overwrite each other
+        os.replace(temp_path, path)
+        self.prune(keep=path)
+        return path
+
+    def entries(self) -> list[tuple[Path, os.stat_result]]:
+        entries = []
+        try:
+            scanned = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        for entry in scanned:
+            # Dot-files are conversions still being written by some worker, directories hold other caches (vad)
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                entries.append((Path(entry.path), entry.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def stats(self) -> tuple[int, int]:
+        entries = self.entries()
+        return len(entries), sum(stat.st_size for _, stat in entries)
+
+    def prune(self, max_bytes: int | None = None, keep: Path | None = None) -> tuple[int, int]:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda entry: entry[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        removed = 0
+        freed = 0
+        for path, stat in entries:
+            if total <= limit:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                # Already evicted by another worker or still open on Windows
+                continue
+            total -= stat.st_size
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+
+class VadCache:
+    """Speech timestamps per audio content and VAD parameters, so repeated runs skip Silero VAD"""
+    def __init__(self, directory: Path | None = None, max_entries: int = DEFAULT_VAD_CACHE_ENTRIES):
+        self.directory = Path(directory) if directory else WavCache.default_directory() / 'vad'
+        self.max_entries = max_entries
+
+    def _path(self, audio_file: Path, vad_parameters: dict) -> Path:
+        params = json.dumps(vad_parameters, sort_keys=True)
+        key = hashlib.sha1(f'{content_fingerprint(audio_file)}|{params}'.encode('utf-8')).hexdigest()
+        return self.directory / f'{key}.json'
+
+    def get(self, audio_file: Path, vad_parameters: dict) -> list[tuple[float, float]] | None:
+        path = self._path(audio_file, vad_parameters)
+        try:
+            with open(path, encoding='utf-8') as f:
+                speech = [tuple(region) for region in json.load(f)]
+            # Refresh mtime, eviction removes the least recently used entries first
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return speech
+
+    def put(self, audio_file: Path, vad_parameters: dict, speech: list[tuple[float, float]]):
+        path = self._path(audio_file, vad_parameters)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(speech, f)
+        os.replace(temp_path, path)
+        self.prune(keep=path)
+
+    def entries(self) -> list[tuple[Path, os.stat_result]]:
+        entries = []
+        try:
+            scanned = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        for entry in scanned:
+            if entry.name.startswith('.') or not entry.name.endswith('.json'):
+                continue
+            try:
+                entries.append((Path(entry.path), entry.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def prune(self, max_entries: int | None = None, keep: Path | None = None) -> int:
+        """Remove least recently used entries until at most max_entries are left"""
+        limit = self.max_entries if max_entries is None else max_entries
+        entries = sorted(self.entries(), key=lambda entry: entry[1].st_mtime)
+        excess = len(entries) - limit
+        removed = 0
+        for path, _ in entries:
+            if removed >= excess:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            removed += 1
+        return removed
+
+
+class BatchManifest:
+    """Record of files already transcribed into an output directory, used to skip unchanged inputs"""
+    FILE_NAME = '.russian-whisper-manifest.json'
+
+    def __init__(self, output_dir: Path, input_dir: Path):
+        self.path = output_dir / self.FILE_NAME
+        self.input_dir = input_dir
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    @staticmethod
+    def fingerprint(audio_file: Path) -> str:
+        stat = audio_file.stat()
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    def _key(self, audio_file: Path) -> str:
+        try:
+            return audio_file.relative_to(self.input_dir).as_posix()
+        except ValueError:
+            return str(audio_file.resolve())
+
+    def is_current(self, audio_file: Path, output_files: list[Path], settings_hash: Callable[[float], str]) -> bool:
+        """True if all outputs exist and were made from the same input with the same model and parameters"""
+        entry = self.entries.get(self._key(audio_file))
+        if not entry or not all(output_file.exists() for output_file in output_files):
+            return False
+        if entry.get('fingerprint') != self.fingerprint(audio_file):
+            return False
+        # Decoding parameters depend on duration, the stored one is valid while the fingerprint matches
+        return entry.get('settings') == settings_hash(entry.get('duration', 0.0))
+
+    def record(self, audio_file: Path, output_file: Path, duration: float, settings: str):
+        self.entries[self._key(audio_file)] = {
+            'fingerprint': self.fingerprint(audio_file),
+            'duration': duration,
+            'settings': settings,
+            'output': output_file.name,
+        }
+        self.save()
+
+    def save(self):
+        temp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+
+class Checkpoint:
+    """Progress sidecar next to an output file, lets an interrupted transcription continue where it stopped"""
+    def __init__(self, output_file: Path, audio_file: Path, settings: str):
+        self.path = output_file.with_name(f'{output_file.name}.checkpoint.json')
+        self.fingerprint = BatchManifest.fingerprint(audio_file)
+        self.settings = settings
+
+    def load(self, part_paths: dict[str, Path]) -> dict | None:
+        """Return the saved end time, byte offsets and writer states if they match this input, settings and partial outputs"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get('fingerprint') != self.fingerprint or data.get('settings') != self.settings:
+            return None
+        offsets = data.get('offsets', {})
+        for key, part_path in part_paths.items():
+            try:
+                if key not in offsets or part_path.stat().st_size < offsets[key]:
+                    return None
+            except FileNotFoundError:
+                return None
+        return data
+
+    def save(self, end: float, offsets: dict[str, int], states: dict[str, dict]):
+        data = {'end': end, 'offsets': offsets, 'states': states, 'fingerprint': self.fingerprint, 'settings': self.settings}
+        temp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+class FileMetrics:
+    """Stage timings and counters of one transcribed file"""
+    def __init__(self, audio_file: Path):
+        self.audio_file = audio_file
+        self.stages: dict[str, float] = {}
+        self.audio_seconds = 0.0
+        self.segments = 0
+        self.cache: str | None = None
+        self.vad_cache: str | None = None
+        # Cascade counters are in draft segments, re-decoding may produce a different number of output segments
+        self.draft_segments = 0
+        self.escalated_segments = 0
+        self.escalated_seconds = 0.0
+        self.started = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            'file': str(self.audio_file),
+            'audio_seconds': self.audio_seconds,
+            'wall_seconds': self.wall_seconds,
+            # A model loaded while handling this file is a one-off cost of the process, not of the file
+            'rtf': (self.wall_seconds - self.stages.get('model_load', 0.0)) / self.audio_seconds if self.audio_seconds else None,
+            'segments': self.segments,
+            'cache': self.cache,
+            'vad_cache': self.vad_cache,
+            'draft_segments': self.draft_segments,
+            'escalated_segments': self.escalated_segments,
+            'escalated_seconds': self.escalated_seconds,
+            'stages': self.stages,
+        }
+
+
+class MetricsExporter:
+    """Writes per-file metrics as JSON lines and keeps node totals in a Prometheus textfile"""
+    def __init__(self, jsonl_path: Path | None = None, prometheus_path: Path | None = None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.host = socket.gethostname()
+        self.lock = threading.Lock()
+        self.totals = {'files': 0, 'audio_seconds': 0.0, 'wall_seconds': 0.0, 'segments': 0}
+        self.stage_totals: dict[str, float] = {}
+        self.cache_totals: dict[tuple[str, str], int] = {}
+        self.last_rtf = 0.0
+
+    def record(self, metrics: dict):
+        with self.lock:
+            if self.jsonl_path:
+                line = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'host': self.host, **metrics}
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(line, ensure_ascii=False) + '\n')
+            if self.prometheus_path:
+                self.totals['files'] += 1
+                self.totals['audio_seconds'] += metrics['audio_seconds']
+                self.totals['wall_seconds'] += metrics['wall_seconds']
+                self.totals['segments'] += metrics['segments']
+                for stage, seconds in metrics['stages'].items():
+                    self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+                for cache, field in (('wav', 'cache'), ('vad', 'vad_cache')):
+                    if metrics.get(field):
+                        key = (cache, metrics[field])
+                        self.cache_totals[key] = self.cache_totals.get(key, 0) + 1
+                self.last_rtf = metrics['rtf'] or 0.0
+                self._write_prometheus()
+
+    def _write_prometheus(self):
+        lines = [
+            '# TYPE russian_whisper_files_total counter',
+            f'russian_whisper_files_total {self.totals["files"]}',
+            '# TYPE russian_whisper_audio_seconds_total counter',
+            f'russian_whisper_audio_seconds_total {self.totals["audio_seconds"]:.3f}',
+            '# TYPE russian_whisper_wall_seconds_total counter',
+            f'russian_whisper_wall_seconds_total {self.totals["wall_seconds"]:.3f}',
+            '# TYPE russian_whisper_segments_total counter',
+            f'russian_whisper_segments_total {self.totals["segments"]}',
+            '# TYPE russian_whisper_last_rtf gauge',
+            f'russian_whisper_last_rtf {self.last_rtf:.4f}',
+            '# TYPE russian_whisper_stage_seconds_total counter',
+            *(f'russian_whisper_stage_seconds_total{{stage="{stage}"}} {seconds:.3f}' for stage, seconds in self.stage_totals.items()),
+            '# TYPE russian_whisper_cache_requests_total counter',
+            *(f'russian_whisper_cache_requests_total{{cache="{cache}",result="{result}"}} {count}'
+              for (cache, result), count in self.cache_totals.items()),
+        ]
+        # node_exporter may read the file at any moment, so it is replaced atomically
+        temp_path = self.prometheus_path.with_name(f'{self.prometheus_path.name}.{os.getpid()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, self.prometheus_path)
+
+
+class JobFeed:
+    """Pulls jobs from an iterator that may block (the --watch loop) in a background thread"""
+    _DONE = object()
+
+    def __init__(self, jobs: Iterable, on_job: Callable[[tuple], None] | None = None):
+        self.queue: queue.Queue = queue.Queue()
+        self.exhausted = False
+        self.error: BaseException | None = None
+        # Called in the feed thread as soon as a job is scanned, before it is taken for processing
+        self.on_job = on_job
+        threading.Thread(target=self._fill, args=(iter(jobs),), name='job-feed', daemon=True).start()
+
+    def _fill(self, jobs: Iterator):
+        try:
+            for job in jobs:
+                if self.on_job:
+                    self.on_job(job)
+                self.queue.put(job)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.queue.put(self._DONE)
+
+    def get(self, block: bool = False):
+        """Next job, or None if there is none right now (block=False) or none will ever come"""
+        while not self.exhausted:
+            try:
+                # Short timeouts keep Ctrl+C responsive while waiting for the watcher
+                job = self.queue.get(timeout=0.5) if block else self.queue.get_nowait()
+            except queue.Empty:
+                if not block:
+                    return None
+                continue
+            if job is not self._DONE:
+                return job
+            self.exhausted = True
+            if self.error is not None:
+                raise self.error
+        return None
+
+
+class BatchProgress:
+    """Progress over the total audio seconds of a batch, so the ETA covers every remaining file"""
+    def __init__(self, console: Console):
+        self.progress = Progress(
+            TextColumn("[bold cyan]{task.description}"),
+            BarColumn(bar_width=40),
+            TaskProgressColumn(),
+            TimeElapsedColumn(),
+            TextColumn("/"),
+            TimeRemainingColumn(),
+            console=console,
+        )
+        self.overall = self.progress.add_task("Всего", total=0)
+        self.expected: dict[Path, float] = {}
+        self.completed: dict[Path, float] = {}
+        self.tasks: dict[Path, int] = {}
+        self.finished: set[Path] = set()
+        # Files are added from the job feed thread while the main thread updates progress
+        self.lock = threading.Lock()
+
+    @property
+    def console(self) -> Console:
+        return self.progress.console
+
+    def add(self, audio_file: Path, duration: float | None):
+        with self.lock:
+            if audio_file in self.expected:
+                return
+            self.expected[audio_file] = duration or 0.0
+            self._refresh()
+
+    def update(self, audio_file: Path, completed: float, total: float):
+        with self.lock:
+            if audio_file in self.finished:
+                return
+            task = self.tasks.get(audio_file)
+            if task is None:
+                task = self.tasks[audio_file] = self.progress.add_task(audio_file.name, total=total)
+            self.progress.update(task, completed=completed, total=total)
+            # The probed duration is only an estimate until the file itself has been opened
+            self.expected[audio_file] = total
+            self.completed[audio_file] = completed
+            self._refresh()
+
+    def tracker(self, audio_file: Path) -> Callable[[float, float], None]:
+        return lambda completed, total: self.update(audio_file, completed, total)
+
+    def finish(self, audio_file: Path):
+        """Mark a file as processed, failed files included, so the remaining work stays accurate"""
+        with self.lock:
+            task = self.tasks.pop(audio_file, None)
+            if task is not None:
+                self.progress.remove_task(task)
+            self.completed[audio_file] = self.expected.get(audio_file, 0.0)
+            self.finished.add(audio_file)
+            self._refresh()
+
+    def _refresh(self):
+        self.progress.update(
+            self.overall,
+            description=f"Всего: {len(self.finished)}/{len(self.expected)} файлов",
+            completed=sum(self.completed.values()),
+            total=sum(self.expected.values()),
+        )
+
+    def __enter__(self) -> 'BatchProgress':
+        self.progress.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.progress.stop()
+
+
+class AdjustedWord:
+    def __init__(self, original, time_offset):
+        self.start = original.start + time_offset
+        self.end = original.end + time_offset
+        self.word = original.word
+        self.probability = original.probability
+
+
 class AdjustedSegment:
     def __init__(self, original, time_offset):
         self.start = original.start + time_offset
         self.end = original.end + time_offset
         self.text = original.text
+        self.words = [AdjustedWord(word, time_offset) for word in (getattr(original, 'words', None) or [])]
+        self.avg_logprob = getattr(original, 'avg_logprob', None)
+        self.compression_ratio = getattr(original, 'compression_ratio', None)
+        self.no_speech_prob = getattr(original, 'no_speech_prob', None)
+
+
+def _format_timestamp(seconds: float, decimal_marker: str) -> str:
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}'
+
+
+def _segment_to_dict(segment) -> dict:
+    return {
+        'start': round(segment.start, 3),
+        'end': round(segment.end, 3),
+        'text': segment.text.strip(),
+        'words': [
+            {'start': round(word.start, 3), 'end': round(word.end, 3), 'word': word.word, 'probability': round(word.probability, 4)}
+            for word in (getattr(segment, 'words', None) or [])
+        ],
+    }
+
+
+class TranscriptWriter:
+    """One output format; writes into `<name>.part` and renames it to the final name once complete"""
+    suffix = '.txt'
+    # Whether an existing finished file can be continued by appending (manual --resume-time)
+    appendable = True
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, path: Path, print_segments: bool):
+        self.path = path
+        self.part_path = path.with_name(f'{path.name}.part')
+        self.print_segments = print_segments
+        self.count = 0
+        self.f = None
+
+    def open(self, offset: int | None = None, state: dict | None = None, append_existing: bool = False):
+        if offset is not None:
+            # Continue a checkpointed run: drop whatever was written after the last checkpoint
+            os.truncate(self.part_path, offset)
+            self.f = open(self.part_path, 'a', encoding='utf-8', buffering=self.BUFFER_SIZE)
+            self.count = (state or {}).get('count', 0)
+        elif append_existing and self.appendable and self.path.exists():
+            shutil.copyfile(self.path, self.part_path)
+            self.f = open(self.part_path, 'a', encoding='utf-8', buffering=self.BUFFER_SIZE)
+        else:
+            self.f = open(self.part_path, 'w', encoding='utf-8', buffering=self.BUFFER_SIZE)
+            self.f.write(self.header())
+
+    def header(self) -> str:
+        return ''
+
+    def footer(self) -> str:
+        return ''
+
+    def format(self, segment) -> str:
+        return (f'[{segment.start:.2f} -> {segment.end:.2f}] {segment.text.strip()}' if self.print_segments else segment.text.strip()) + '\n'
+
+    def write(self, segment):
+        self.f.write(self.format(segment))
+        self.count += 1
+
+    def offset(self) -> int:
+        return self.f.tell()
+
+    def state(self) -> dict:
+        return {'count': self.count}
+
+    def flush(self, fsync: bool = False):
+        self.f.flush()
+        if fsync:
+            os.fsync(self.f.fileno())
+
+    def close(self, complete: bool, fsync: bool = False):
+        if complete:
+            self.f.write(self.footer())
+        self.flush(fsync)
+        self.f.close()
+        if complete:
+            os.replace(self.part_path, self.path)
+
+
+class SrtWriter(TranscriptWriter):
+    suffix = '.srt'
+
+    def format(self, segment) -> str:
+        start = _format_timestamp(segment.start, ',')
+        end = _format_timestamp(segment.end, ',')
+        return f'{self.count + 1}\n{start} --> {end}\n{segment.text.strip()}\n\n'
+
+
+class VttWriter(TranscriptWriter):
+    suffix = '.vtt'
+
+    def header(self) -> str:
+        return 'WEBVTT\n\n'
+
+    def format(self, segment) -> str:
+        return f'{_format_timestamp(segment.start, ".")} --> {_format_timestamp(segment.end, ".")}\n{segment.text.strip()}\n\n'
+
+
+class JsonlWriter(TranscriptWriter):
+    suffix = '.jsonl'
+
+    def format(self, segment) -> str:
+        return json.dumps(_segment_to_dict(segment), ensure_ascii=False) + '\n'
+
+
+class JsonWriter(TranscriptWriter):
+    suffix = '.json'
+    appendable = False
+
+    def header(self) -> str:
+        return '[\n'
+
+    def footer(self) -> str:
+        return '\n]\n'
+
+    def format(self, segment) -> str:
+        # The array is written item by item so that checkpoints can truncate it like the other formats
+        separator = ',\n' if self.count else ''
+        return separator + json.dumps(_segment_to_dict(segment), ensure_ascii=False)
+
+
+OUTPUT_WRITERS = {
+    'txt': TranscriptWriter,
+    'srt': SrtWriter,
+    'vtt': VttWriter,
+    'json': JsonWriter,
+    'jsonl': JsonlWriter,
+}
+
+
+class TranscriptOutput:
+    """Writes every requested format from one pass over the segments, flushing and checkpointing periodically"""
+    def __init__(self, output_file: Path, formats: Iterable[str], print_segments: bool, checkpoint: Checkpoint | None = None,
+            flush_interval: float = 5.0, fsync: bool = False):
+        # Plain text keeps the exact requested name, other formats sit next to it
+        self.writers = [
+            OUTPUT_WRITERS[fmt](output_file if fmt == 'txt' else output_file.with_suffix(OUTPUT_WRITERS[fmt].suffix), print_segments)
+            for fmt in formats
+        ]
+        self.checkpoint = checkpoint
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.last_end = None
+        self.last_flush = time.monotonic()
+
+    @property
+    def paths(self) -> list[Path]:
+        return [writer.path for writer in self.writers]
+
+    @property
+    def part_paths(self) -> dict[str, Path]:
+        return {writer.suffix: writer.part_path for writer in self.writers}
+
+    def open(self, saved: dict | None = None, append_existing: bool = False) -> 'TranscriptOutput':
+        for writer in self.writers:
+            if saved is not None:
+                writer.open(saved['offsets'][writer.suffix], saved['states'].get(writer.suffix))
+            else:
+                writer.open(append_existing=append_existing)
+        return self
+
+    def write(self, segment):
+        for writer in self.writers:
+            writer.write(segment)
+        self.last_end = segment.end
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        for writer in self.writers:
+            writer.flush(self.fsync)
+        self.last_flush = time.monotonic()
+        # Offsets are recorded only after a flush, so they never point past what is on disk
+        if self.checkpoint is not None and self.last_end is not None:
+            self.checkpoint.save(
+                self.last_end,
+                {writer.suffix: writer.offset() for writer in self.writers},
+                {writer.suffix: writer.state() for writer in self.writers},
+            )
+
+    def close(self, complete: bool):
+        if not complete:
+            self.flush()
+        for writer in self.writers:
+            writer.close(complete, self.fsync)
+
+    def __enter__(self) -> 'TranscriptOutput':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
 
 class RussianWhisperTranscriber:
-    def __init__(self, model_name='turbo', device_preference='cuda', cpu_threads=4, dry_run=False):
+    def __init__(self, model_name='turbo', device_preference='cuda', cpu_threads=4, wav_cache: WavCache | None = None,
+            metrics: MetricsExporter | None = None, compute_type: str | None = None, vad_cache: VadCache | None = None,
+            output_formats: Iterable[str] = ('txt',), flush_interval: float = 5.0, fsync: bool = False,
+            cascade_model: str | None = None, cascade_thresholds: dict | None = None,
+            stream_threshold: float = DEFAULT_STREAM_THRESHOLD):
         self.model_name = model_name
         self.device_preference = device_preference
+        self.compute_type = compute_type
         self.cpu_threads = cpu_threads
+        self.wav_cache = wav_cache
+        self.vad_cache = vad_cache
+        self.metrics = metrics
+        self.output_formats = tuple(output_formats)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.cascade_model = cascade_model
+        self.cascade_thresholds = {**CASCADE_THRESHOLDS, **(cascade_thresholds or {})}
+        self.stream_threshold = stream_threshold
         self.console = Console()
-        if not dry_run:
-            self.model = self._init_model()
+        self._model = None
+        self._draft_model = None
+
+    @property
+    def model(self):
+        """Model is loaded on first use, so dry runs and worker-pool parents never pay for it"""
+        if self._model is None:
+            self._model = self._init_model()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
 
     def _init_model(self):
+        from faster_whisper import WhisperModel
+        if self.compute_type:
+            # Explicit configuration, e.g. from --autotune: no fallback
+            model = WhisperModel(self.model_name, device=self.device_preference, compute_type=self.compute_type, cpu_threads=self.cpu_threads)
+            print(f'Используется {self.device_preference.upper()} ({self.compute_type}, {self.cpu_threads} потоков)')
+            return model
         try:
             model = WhisperModel(self.model_name, device=self.device_preference, compute_type='float16')
             print(f'Используется ускорение {self.device_preference.upper()}')
@@ -53,34 +818,91 @@ class RussianWhisperTranscriber:
             print(f'Используется CPU с {self.cpu_threads} потоками')
         return model
 
+    @property
+    def draft_model(self):
+        """Small model of --cascade mode; the main model is then loaded only when a segment is escalated"""
+        if self._draft_model is None:
+            from faster_whisper import WhisperModel
+            try:
+                self._draft_model = WhisperModel(self.cascade_model, device=self.device_preference, compute_type='int8')
+                print(f'Черновая модель {self.cascade_model}: {self.device_preference.upper()} (int8)')
+            except Exception:
+                self._draft_model = WhisperModel(self.cascade_model, device='cpu', compute_type='int8', cpu_threads=self.cpu_threads)
+                print(f'Черновая модель {self.cascade_model}: CPU (int8, {self.cpu_threads} потоков)')
+        return self._draft_model
+
     def find_audio_files(self, directory: Path):
-        supported_extensions = ['*.mp3', '*.wav', '*.flac', '*.m4a', '*.aac', '*.ogg', '*.wma']
-        audio_files = []
         if not directory.exists():
             print(f'Ошибка: Папка {directory} не существует')
             return []
-        for ext in supported_extensions:
-            pattern = directory / ext
-            files = glob.glob(str(pattern), recursive=False)
-            audio_files.extend(files)
-            pattern_recursive = directory / '**' / ext
-            files_recursive = glob.glob(str(pattern_recursive), recursive=True)
-            audio_files.extend(files_recursive)
-        # Convert all paths to Path objects and remove duplicates
-        audio_files = sorted(list(set([Path(file) for file in audio_files])))
+        audio_files = list(self.iter_audio_files(directory))
         print(f'Найдено аудиофайлов: {len(audio_files)}')
         for file in audio_files:
             print(f'  - {file.name}')
         return audio_files
 
+    def iter_audio_files(self, directory: Path) -> Iterator[Path]:
+        """Walk the tree once with os.scandir and yield audio files as they are found, in sorted path order"""
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError as e:
+            print(f'Ошибка чтения папки {directory}: {e}')
+            return
+        for entry in entries:
+            # Hidden files and folders (caches, manifests) are skipped, as glob did
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir():
+                    yield from self.iter_audio_files(Path(entry.path))
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    yield Path(entry.path)
+            except OSError:
+                continue
+
+    def watch_audio_files(self, directory: Path, interval: float = 5.0) -> Iterator[Path]:
+        """Yield existing audio files, then keep polling for new ones and yield them once fully written"""
+        seen = set()
+        for audio_file in self.iter_audio_files(directory):
+            seen.add(audio_file)
+            yield audio_file
+        print(f'Ожидаем новые файлы в \033[92m{directory}\033[0m (Ctrl+C для выхода)...')
+        # Candidates still being copied: path -> (size, mtime) at the previous poll
+        growing: dict[Path, tuple[int, int]] = {}
+        while True:
+            time.sleep(interval)
+            for audio_file in self.iter_audio_files(directory):
+                if audio_file in seen:
+                    continue
+                try:
+                    stat = audio_file.stat()
+                except FileNotFoundError:
+                    growing.pop(audio_file, None)
+                    continue
+                state = (stat.st_size, stat.st_mtime_ns)
+                # A file counts as written once its size and mtime did not change for a whole interval
+                if growing.get(audio_file) == state:
+                    del growing[audio_file]
+                    seen.add(audio_file)
+                    print(f'Новый файл: {audio_file.name}')
+                    yield audio_file
+                else:
+                    growing[audio_file] = state
+
     def transcribe_russian_audio(self, 
             audio_file: Path, 
             output_file: Path | None = None, 
             print_segments: bool = False, 
             echo: bool = True, 
             dry_run: bool = False,
-            resume_time: int = 0,
-            use_ffmpeg: bool = True):
+            resume_time: float = 0,
+            use_ffmpeg: bool = True,
+            on_progress: Callable[[float, float], None] | None = None,
+            chunks: int = 1,
+            prepared_audio: Future | None = None,
+            on_segment: Callable[[object], None] | None = None,
+            metrics: FileMetrics | None = None,
+            duration: float | None = None) -> FileMetrics | list:
         if output_file is None:
             output_file = audio_file.with_suffix('.txt')
         
@@ -90,21 +912,106 @@ class RussianWhisperTranscriber:
         
         print(f'  Сохраняем в \033[92m{output_file.name}\033[0m')
 
-        readable_path, info = self._get_readable_audio_path_and_info(audio_file, output_file=output_file, use_ffmpeg=use_ffmpeg)
+        if metrics is None:
+            metrics = FileMetrics(audio_file)
+        # Probing of prefetched files happened in the background and is not part of this file's wall time
+        metrics.started = time.perf_counter()
+        if prepared_audio is None and self.stream_threshold and chunks <= 1 and duration is None:
+            with metrics.stage('probe'):
+                duration = probe_duration(audio_file)
+        streamed = prepared_audio is None and self._is_streamed(duration, chunks)
+        if prepared_audio is not None:
+            with metrics.stage('prefetch_wait'):
+                readable_path, info = prepared_audio.result()
+        elif streamed:
+            # Nothing is decoded up front, windows are read while segments are consumed
+            readable_path, info = audio_file, DecodedAudioInfo(round(duration * SAMPLE_RATE))
+        else:
+            with metrics.stage('probe'):
+                readable_path, info = self._get_readable_audio_path_and_info(audio_file, use_ffmpeg=use_ffmpeg, metrics=metrics)
+            # Conversion is timed as its own nested stage, keep the probe stage exclusive of it
+            metrics.stages['probe'] -= metrics.stages.get('ffmpeg', 0.0)
+        audio = readable_path if isinstance(readable_path, np.ndarray) else str(readable_path)
+        metrics.audio_seconds = info.duration
         print(f'  Длительность: \033[92m{info.duration:.2f}\033[0m секунд')
+        checkpoint = Checkpoint(output_file, audio_file, self._settings_hash(info.duration, print_segments))
+        output = self.transcript_output(output_file, print_segments, checkpoint)
+        saved = None
+        if not resume_time:
+            saved = checkpoint.load(output.part_paths)
+            if saved is not None:
+                resume_time = saved['end']
+                print(f'  Найдена контрольная точка: продолжаем с {resume_time:.2f}с')
+                if resume_time >= info.duration:
+                    output.open(saved).close(complete=True)
+                    checkpoint.remove()
+                    return self._finish_metrics(metrics)
+        if on_progress:
+            on_progress(resume_time, info.duration)
         start_time = time.time()
-        if echo:
-            with self.console.status("[bold cyan]  Анализ аудио (VAD)...[/]", spinner="dots"):
-                segments, _ = self._transcribe_audio_with_duration_strategy(str(readable_path), info.duration, resume_time)
+        # Cascade decoding is sequential by nature, chunk workers only carry the main model
+        use_chunks = chunks > 1 and not self.cascade_model and info.duration - resume_time >= CHUNKED_MIN_DURATION
+        # Chunk workers load their own models; otherwise the first file loads it here, apart from VAD and decoding
+        if not use_chunks and (self._draft_model if self.cascade_model else self._model) is None:
+            with metrics.stage('model_load'):
+                self.draft_model if self.cascade_model else self.model
+        if streamed:
+            print(f'  Потоковая обработка окнами по {STREAM_WINDOW // 60} мин')
+            segments = self._transcribe_windowed(audio_file, info.duration, resume_time, use_ffmpeg, metrics)
         else:
-            segments, _ = self._transcribe_audio_with_duration_strategy(str(readable_path), info.duration, resume_time)
-        file_mode = 'a' if resume_time else 'w'
-        with open(output_file, file_mode, encoding='utf-8') as f:
-            self._process_segments(f, segments, info.duration, print_segments, echo)
+            with metrics.stage('vad'):
+                speech = None
+                if self.vad_cache is not None:
+                    speech = self.vad_cache.get(audio_file, self._get_base_params()['vad_parameters'])
+                    metrics.vad_cache = 'miss' if speech is None else 'hit'
+                # On a VAD cache hit only feature extraction is left before decoding starts
+                status = "[bold cyan]  Анализ аудио (VAD)...[/]" if speech is None else "[bold cyan]  Подготовка аудио (VAD из кэша)...[/]"
+                with (self.console.status(status, spinner="dots") if echo else nullcontext()):
+                    if self.vad_cache is not None and speech is None:
+                        audio, speech = self._detect_speech(audio)
+                        self.vad_cache.put(audio_file, self._get_base_params()['vad_parameters'], speech)
+                    if use_chunks:
+                        segments = self._transcribe_chunked(audio, chunks, resume_time, speech)
+                    elif self.cascade_model:
+                        segments = self._transcribe_cascade(audio, info.duration, resume_time, speech, metrics)
+                    else:
+                        segments, _ = self._transcribe_audio_with_duration_strategy(audio, info.duration, resume_time, speech)
+        # A manual resume point continues the finished outputs of an earlier run
+        with output.open(saved, append_existing=bool(resume_time)):
+            nested = ('output', 'escalate', 'window_read', 'model_load', 'vad')
+            nested_before = sum(metrics.stages.get(stage, 0.0) for stage in nested)
+            with metrics.stage('decode'):
+                self._process_segments(output, segments, info.duration, print_segments, echo, on_progress, on_segment, metrics)
+            # Segment iteration includes the writes, the cascade's lazy main model and VAD of streamed windows, keep decode exclusive of them
+            metrics.stages['decode'] -= sum(metrics.stages.get(stage, 0.0) for stage in nested) - nested_before
             end_time = time.time()
             self.console.print(f'Распознавание завершено за {end_time - start_time:.2f} секунд')
+            if self.cascade_model and metrics.draft_segments:
+                self.console.print(
+                    f'Каскад: основной моделью перераспознано {metrics.escalated_segments} из {metrics.draft_segments} черновых сегментов, '
+                    f'{metrics.escalated_seconds:.1f} из {info.duration - resume_time:.1f} с '
+                    f'({metrics.escalated_seconds / max(info.duration - resume_time, 1e-9):.0%})')
+        checkpoint.remove()
+        return self._finish_metrics(metrics)
+
+    def transcript_output(self, output_file: Path, print_segments: bool, checkpoint: Checkpoint | None = None) -> TranscriptOutput:
+        """Writers for every configured output format of one input file"""
+        return TranscriptOutput(output_file, self.output_formats, print_segments, checkpoint, self.flush_interval, self.fsync)
+
+    def _is_streamed(self, duration: float | None, chunks: int = 1) -> bool:
+        """Long files are read in windows, unless --chunks asks to decode the whole array in parallel"""
+        return bool(self.stream_threshold) and chunks <= 1 and duration is not None and duration > self.stream_threshold
+
+    def _finish_metrics(self, metrics: FileMetrics) -> FileMetrics:
+        metrics.finish()
+        if self.metrics:
+            self.metrics.record(metrics.to_dict())
+        return metrics
 
-    def _get_readable_audio_path_and_info(self, audio_file: Path, output_file: Path, use_ffmpeg: bool) -> tuple[Path, sf._SoundFileInfo]:
+    def _get_readable_audio_path_and_info(self, audio_file: Path, use_ffmpeg: bool,
+            metrics: FileMetrics | None = None) -> tuple[Path | np.ndarray, sf._SoundFileInfo | DecodedAudioInfo]:
+        if metrics is None:
+            metrics = FileMetrics(audio_file)
         try:
             return audio_file, sf.info(str(audio_file))
         except sf.LibsndfileError as e:
@@ -115,34 +1022,65 @@ class RussianWhisperTranscriber:
             if not ffmpeg_path:
                 raise UnsupportedAudioFormatError(self._humanize_soundfile_error(audio_file, e, ffmpeg_enabled=True, ffmpeg_found=False)) from None
 
-            converted = self._ffmpeg_convert_to_wav(audio_file, output_file=output_file, ffmpeg_path=ffmpeg_path)
+            if self.wav_cache is None:
+                with metrics.stage('ffmpeg'):
+                    audio = self._ffmpeg_decode_to_array(audio_file, ffmpeg_path=ffmpeg_path)
+                return audio, DecodedAudioInfo(len(audio))
+
+            with metrics.stage('ffmpeg'):
+                converted = self._ffmpeg_convert_to_wav(audio_file, ffmpeg_path=ffmpeg_path, metrics=metrics)
             try:
                 info = sf.info(str(converted))
             except sf.LibsndfileError as e2:
                 raise UnsupportedAudioFormatError(self._humanize_soundfile_error(audio_file, e2, ffmpeg_enabled=True, ffmpeg_found=True)) from None
             return converted, info
 
-    def _ffmpeg_convert_to_wav(self, audio_file: Path, output_file: Path, ffmpeg_path: str) -> Path:
-        cache_dir = output_file.parent / '.russian-whisper-cache'
-        try:
-            cache_dir.mkdir(parents=True, exist_ok=True)
-        except Exception:
-            cache_dir = Path(tempfile.gettempdir()) / 'russian-whisper-cache'
-            cache_dir.mkdir(parents=True, exist_ok=True)
-
-        try:
-            stat = audio_file.stat()
-            key = f'{audio_file.resolve()}|{stat.st_size}|{stat.st_mtime_ns}'.encode('utf-8', errors='ignore')
-        except Exception:
-            key = str(audio_file).encode('utf-8', errors='ignore')
+    def _ffmpeg_decode_to_array(self, audio_file: Path, ffmpeg_path: str, start: float | None = None, length: float | None = None) -> np.ndarray:
+        """Decode audio with ffmpeg straight into a float32 mono 16 kHz buffer, without temporary files"""
+        window = []
+        if start is None:
+            print('  Формат не поддерживается soundfile — декодируем через ffmpeg в память...')
+        else:
+            # Input seeking, ffmpeg jumps to the window instead of decoding everything before it
+            window = ['-ss', f'{start:.3f}', '-t', f'{length:.3f}']
+        cmd = [
+            ffmpeg_path,
+            '-hide_banner',
+            '-loglevel', 'error',
+            *window,
+            '-i', str(audio_file),
+            '-ac', '1',
+            '-ar', str(SAMPLE_RATE),
+            '-vn',
+            '-f', 'f32le',
+            '-acodec', 'pcm_f32le',
+            'pipe:1',
+        ]
+        completed = subprocess.run(cmd, capture_output=True)
+        # A window may legitimately be empty when the probed duration overshoots the real one
+        if completed.returncode != 0 or (start is None and not completed.stdout):
+            details = completed.stderr.decode('utf-8', errors='replace').strip()
+            if details:
+                details = '\n' + details
+            raise UnsupportedAudioFormatError(
+                'ffmpeg не смог декодировать файл.\n'
+                f'Файл: {audio_file}\n'
+                f'Команда: {" ".join(cmd)}{details}'
+            )
+        # The array is a view of ffmpeg's output, one float32 copy of the audio in memory
+        return np.frombuffer(completed.stdout, dtype=np.float32)
 
-        digest = hashlib.sha1(key).hexdigest()[:12]
-        out_path = cache_dir / f'{audio_file.stem}.{digest}.wav'
-        if out_path.exists():
+    def _ffmpeg_convert_to_wav(self, audio_file: Path, ffmpeg_path: str, metrics: FileMetrics | None = None) -> Path:
+        key = self.wav_cache.key(audio_file)
+        out_path = self.wav_cache.lookup(key)
+        if metrics is not None:
+            metrics.cache = 'miss' if out_path is None else 'hit'
+        if out_path is not None:
             print(f'  Используем кэш WAV: \033[90m{out_path.name}\033[0m')
             return out_path
 
         print('  Формат не поддерживается soundfile — пробуем декодировать через ffmpeg...')
+        temp_path = self.wav_cache.temp_path(key)
         cmd = [
             ffmpeg_path,
             '-hide_banner',
@@ -152,10 +1090,11 @@ class RussianWhisperTranscriber:
             '-ac', '1',
             '-ar', '16000',
             '-vn',
-            str(out_path),
+            str(temp_path),
         ]
         completed = subprocess.run(cmd, capture_output=True, text=True)
-        if completed.returncode != 0 or not out_path.exists():
+        if completed.returncode != 0 or not temp_path.exists():
+            temp_path.unlink(missing_ok=True)
             details = (completed.stderr or completed.stdout or '').strip()
             if details:
                 details = '\n' + details
@@ -164,7 +1103,7 @@ class RussianWhisperTranscriber:
                 f'Файл: {audio_file}\n'
                 f'Команда: {" ".join(cmd)}{details}'
             )
-        return out_path
+        return self.wav_cache.store(key, temp_path)
 
     def _humanize_soundfile_error(self, audio_file: Path, err: Exception, ffmpeg_enabled: bool = True, ffmpeg_found: bool = True) -> str:
         suffix = audio_file.suffix.lower()
@@ -201,10 +1140,9 @@ class RussianWhisperTranscriber:
             f'Техническая причина: {err}'
         )
     
-    def _transcribe_audio_with_duration_strategy(self, audio_file_path: str, duration: float, resume_time: int = 0):
-        """Transcribe audio with parameters adapted to file duration"""
-        
-        base_params = {
+    def _get_base_params(self):
+        """Decoding parameters shared by every file regardless of its duration"""
+        return {
             'language': 'ru',
             'word_timestamps': True,
             'vad_filter': True,
@@ -216,22 +1154,245 @@ class RussianWhisperTranscriber:
             'initial_prompt': 'Русская речь, четкое произношение'
         }
 
+    def _transcribe_audio_with_duration_strategy(self, audio: str | np.ndarray, duration: float, resume_time: float = 0,
+            speech: list[tuple[float, float]] | None = None, model=None):
+        """Transcribe audio with parameters adapted to file duration"""
         params = self._get_transcription_params(duration, resume_time)
-        final_params = {**base_params, **params}        
-        return self.model.transcribe(audio_file_path, **final_params)
+        final_params = {**self._get_base_params(), **params}
+        if speech is not None:
+            # Known speech regions are decoded directly as clips instead of running VAD again
+            clips = self._speech_clips(speech, resume_time)
+            if not clips:
+                return iter(()), None
+            final_params['vad_filter'] = False
+            final_params['clip_timestamps'] = [t for clip in clips for t in clip]
+        return (model or self.model).transcribe(audio, **final_params)
+
+    def _read_window(self, audio_file: Path, start: float, length: float, use_ffmpeg: bool) -> np.ndarray:
+        """Decode `length` seconds of audio from `start` as float32 mono 16 kHz"""
+        ffmpeg_path = shutil.which('ffmpeg') if use_ffmpeg else None
+        try:
+            with sf.SoundFile(str(audio_file)) as f:
+                if f.samplerate == SAMPLE_RATE or not ffmpeg_path:
+                    f.seek(min(int(start * f.samplerate), f.frames))
+                    audio = f.read(int(length * f.samplerate), dtype='float32', always_2d=True).mean(axis=1)
+                    if f.samplerate != SAMPLE_RATE:
+                        # Without ffmpeg there is no proper resampler, linear interpolation is enough for speech
+                        positions = np.arange(0, len(audio), f.samplerate / SAMPLE_RATE)
+                        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+                    return audio
+        except sf.LibsndfileError as e:
+            if not ffmpeg_path:
+                raise UnsupportedAudioFormatError(
+                    self._humanize_soundfile_error(audio_file, e, ffmpeg_enabled=use_ffmpeg, ffmpeg_found=False)) from None
+        return self._ffmpeg_decode_to_array(audio_file, ffmpeg_path, start, length)
+
+    def _transcribe_windowed(self, audio_file: Path, duration: float, resume_time: float = 0, use_ffmpeg: bool = True,
+            metrics: FileMetrics | None = None) -> Iterator[AdjustedSegment]:
+        """Transcribe a long file window by window, so only STREAM_WINDOW seconds of audio are in memory at once"""
+        if metrics is None:
+            metrics = FileMetrics(Path())
+        vad_parameters = self._get_base_params()['vad_parameters']
+        speech = None
+        if self.vad_cache is not None:
+            speech = self.vad_cache.get(audio_file, vad_parameters)
+            metrics.vad_cache = 'miss' if speech is None else 'hit'
+        # On a miss each window runs VAD over its own audio, regions of a file covered from the start are cached at the end
+        detected = [] if self.vad_cache is not None and speech is None and not resume_time else None
+        start = resume_time
+        while start < duration:
+            length = min(STREAM_WINDOW, duration - start)
+            final = start + length >= duration
+            with metrics.stage('window_read'):
+                window = self._read_window(audio_file, start, length, use_ffmpeg)
+            if not len(window):
+                break
+            window_speech = None
+            if speech is not None:
+                window_speech = [
+                    (max(region_start, start) - start, min(region_end, start + length) - start)
+                    for region_start, region_end in speech if region_end > start and region_start < start + length
+                ]
+            elif self.vad_cache is not None:
+                with metrics.stage('vad'):
+                    window, window_speech = self._detect_speech(window)
+                if detected is not None:
+                    detected.extend((region_start + start, region_end + start) for region_start, region_end in window_speech)
+            if self.cascade_model:
+                segments = self._transcribe_cascade(window, duration, 0, window_speech, metrics)
+            else:
+                segments, _ = self._transcribe_audio_with_duration_strategy(window, duration, speech=window_speech)
+            # The last segment of a window may be cut at its edge, it is decoded again as part of the next window
+            held = None
+            emitted_end = None
+            for segment in segments:
+                if held is not None:
+                    yield held
+                    emitted_end = held.end
+                held = AdjustedSegment(segment, start)
+            if held is not None and (final or emitted_end is None):
+                yield held
+                emitted_end = held.end
+            if final:
+                break
+            start = emitted_end if emitted_end is not None and emitted_end > start else start + length
+            if detected is not None:
+                # The next window overlaps this one and detects the regions after its start again
+                detected = [(region_start, min(region_end, start)) for region_start, region_end in detected if region_start < start]
+        if detected is not None:
+            self.vad_cache.put(audio_file, vad_parameters, detected)
+
+    def _needs_escalation(self, segment) -> bool:
+        thresholds = self.cascade_thresholds
+        return (segment.avg_logprob < thresholds['avg_logprob']
+                or segment.compression_ratio > thresholds['compression_ratio']
+                or segment.no_speech_prob > thresholds['no_speech_prob'])
+
+    def _transcribe_cascade(self, audio: str | np.ndarray, duration: float, resume_time: float = 0,
+            speech: list[tuple[float, float]] | None = None, metrics: FileMetrics | None = None) -> Iterator:
+        """Draft pass with the small model; runs of low-confidence segments are decoded again by the main model"""
+        if isinstance(audio, str):
+            from faster_whisper import decode_audio
+            audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+        if metrics is None:
+            metrics = FileMetrics(Path())
+        # Called outside the generator, so the draft's VAD and feature extraction run inside the caller's vad stage
+        draft, _ = self._transcribe_audio_with_duration_strategy(audio, duration, resume_time, speech, model=self.draft_model)
+        return self._escalate_drafts(audio, draft, metrics)
+
+    def _escalate_drafts(self, audio: np.ndarray, draft: Iterable, metrics: FileMetrics) -> Iterator:
+        """Yield draft segments, replacing each run of low-confidence ones with the main model's decoding of its span"""
+        flagged = []
+
+        def escalate():
+            start, end = flagged[0].start, flagged[-1].end
+            metrics.escalated_segments += len(flagged)
+            metrics.escalated_seconds += end - start
+            flagged.clear()
+            # Only the flagged span is decoded, so features are not recomputed for the whole file;
+            # VAD stays on, a span flagged for no_speech_prob may hold no speech at all
+            params = {**self._get_base_params(), **self._get_transcription_params(end - start)}
+            if self._model is None:
+                with metrics.stage('model_load'):
+                    self.model
+            with metrics.stage('escalate'):
+                segments, _ = self.model.transcribe(audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], **params)
+                return [AdjustedSegment(segment, start) for segment in segments]
+
+        for segment in draft:
+            metrics.draft_segments += 1
+            if self._needs_escalation(segment):
+                flagged.append(segment)
+                continue
+            if flagged:
+                yield from escalate()
+            yield segment
+        if flagged:
+            yield from escalate()
+
+    @staticmethod
+    def _speech_clips(speech: list[tuple[float, float]], resume_time: float = 0) -> list[tuple[float, float]]:
+        """Speech regions after resume_time, with regions separated by short pauses merged into one clip"""
+        clips = []
+        for start, end in speech:
+            if end <= resume_time:
+                continue
+            start = max(start, resume_time)
+            if clips and start - clips[-1][1] < VAD_MERGE_GAP:
+                clips[-1] = (clips[-1][0], end)
+            else:
+                clips.append((start, end))
+        return clips
+
+    def _detect_speech(self, audio: str | np.ndarray) -> tuple[np.ndarray, list[tuple[float, float]]]:
+        """Run Silero VAD, returns decoded audio and speech regions in seconds"""
+        from faster_whisper import decode_audio
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        if isinstance(audio, str):
+            audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+        vad_options = VadOptions(**self._get_base_params()['vad_parameters'])
+        speech = [(chunk['start'] / SAMPLE_RATE, chunk['end'] / SAMPLE_RATE) for chunk in get_speech_timestamps(audio, vad_options)]
+        return audio, speech
+
+    def _transcribe_chunked(self, audio: str | np.ndarray, chunks: int, resume_time: float = 0,
+            speech: list[tuple[float, float]] | None = None) -> Iterable[AdjustedSegment]:
+        """Cut audio at VAD silences into `chunks` pieces and transcribe them in parallel processes"""
+        if speech is None:
+            audio, speech = self._detect_speech(audio)
+        elif isinstance(audio, str):
+            from faster_whisper import decode_audio
+            audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+        audio = audio[int(resume_time * SAMPLE_RATE):]
+        speech_chunks = [
+            {'start': max(0, int((start - resume_time) * SAMPLE_RATE)), 'end': int((end - resume_time) * SAMPLE_RATE)}
+            for start, end in speech if end > resume_time
+        ]
+        bounds = self._split_at_silence(speech_chunks, len(audio), chunks)
+        threads_per_worker = max(1, (os.cpu_count() or self.cpu_threads) // len(bounds))
+        print(f'  Разбито на {len(bounds)} частей по паузам, {threads_per_worker} потоков CPU на часть')
+
+        def iter_segments():
+            with ProcessPoolExecutor(
+                max_workers=len(bounds),
+                initializer=_init_worker,
+                initargs=(self._worker_kwargs(threads_per_worker), None),
+            ) as pool:
+                futures = [
+                    pool.submit(_transcribe_chunk_in_worker, audio[start:end], resume_time + start / SAMPLE_RATE,
+                        self._chunk_speech(speech_chunks, start, end))
+                    for start, end in bounds
+                ]
+                # Results are consumed in submission order, so segments stay sorted by time
+                for future in futures:
+                    yield from future.result()
+
+        return iter_segments()
+
+    @staticmethod
+    def _chunk_speech(speech_chunks: list[dict], start: int, end: int) -> list[tuple[float, float]]:
+        """Speech regions inside [start, end) samples, in seconds relative to the chunk start"""
+        return [
+            ((max(chunk['start'], start) - start) / SAMPLE_RATE, (min(chunk['end'], end) - start) / SAMPLE_RATE)
+            for chunk in speech_chunks if chunk['end'] > start and chunk['start'] < end
+        ]
+
+    @staticmethod
+    def _split_at_silence(speech_chunks: list[dict], total_samples: int, pieces: int) -> list[tuple[int, int]]:
+        """Pick cut points in the silence gaps closest to equal-length boundaries"""
+        gaps = [(prev['end'] + nxt['start']) // 2 for prev, nxt in zip(speech_chunks, speech_chunks[1:])]
+        cuts = []
+        for k in range(1, pieces):
+            target = total_samples * k // pieces
+            candidates = [gap for gap in gaps if not cuts or gap > cuts[-1]]
+            if not candidates:
+                break
+            cuts.append(min(candidates, key=lambda gap: abs(gap - target)))
+        edges = [0, *cuts, total_samples]
+        return [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
     
-    def _get_transcription_params(self, duration: float, resume_time: int = 0):
+    def _settings_hash(self, duration: float, print_segments: bool) -> str:
+        """Hash of everything besides the input that affects the transcript: model, decoding parameters, output format"""
+        settings = {
+            'model': self.model_name,
+            'params': {**self._get_base_params(), **self._get_transcription_params(duration)},
+            'print_segments': print_segments,
+            'formats': sorted(self.output_formats),
+            'cascade': [self.cascade_model, self.cascade_thresholds] if self.cascade_model else None,
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _get_transcription_params(self, duration: float, resume_time: float = 0):
         """Get transcription parameters based on audio duration and resume status"""
         base_params = {
             'beam_size': 5,
             'best_of': 5
         }
 
-        if resume_time >= duration:
+        if resume_time and resume_time >= duration:
             raise ValueError('Время возобновления выходит за длину аудиофайла.')
         if resume_time > 0:
             print(f'  Возобновление с {resume_time}с')
-            base_params['clip_timestamps'] = resume_time
+            base_params['clip_timestamps'] = [float(resume_time)]
 
         # Always use prevention settings for resume points
         if resume_time or duration > 3600:  # > 1 hour
@@ -263,13 +1424,24 @@ class RussianWhisperTranscriber:
         
         return base_params
         
-    def _process_segments(self, f, segments, total_duration: float, print_segments: bool, echo: bool):
+    def _process_segments(self, output: TranscriptOutput | None, segments, total_duration: float, print_segments: bool, echo: bool,
+            on_progress: Callable[[float, float], None] | None = None,
+            on_segment: Callable[[object], None] | None = None,
+            metrics: FileMetrics | None = None):
+        if metrics is None:
+            metrics = FileMetrics(Path())
         if not echo:
             for segment in segments:
-                line = f'[{segment.start:.2f} -> {segment.end:.2f}] {segment.text.strip()}' if print_segments else segment.text.strip()
-                if f:
-                    f.write(line + '\n')
-                    f.flush()
+                metrics.segments += 1
+                if output:
+                    with metrics.stage('output'):
+                        output.write(segment)
+                if on_segment:
+                    on_segment(segment)
+                if on_progress:
+                    on_progress(segment.end, total_duration)
+            if on_progress:
+                on_progress(total_duration, total_duration)
             return
 
         progress = Progress(
@@ -291,9 +1463,14 @@ class RussianWhisperTranscriber:
                 display_text = line if len(line) <= max_width else line[:max_width - 1] + "\u2026"
                 live.update(Group(progress, Text(f"  {display_text}", style="dim italic")))
 
-                if f:
-                    f.write(line + '\n')
-                    f.flush()
+                metrics.segments += 1
+                if output:
+                    with metrics.stage('output'):
+                        output.write(segment)
+                if on_segment:
+                    on_segment(segment)
+                if on_progress:
+                    on_progress(segment.end, total_duration)
 
             progress.update(task, completed=total_duration)
             live.update(Group(progress, Text("")))
@@ -303,47 +1480,960 @@ class RussianWhisperTranscriber:
             directory_path: Path, 
             output_dir: Path | None = None, 
             print_segments: bool = False, 
-            dry_run: bool = False):
-        audio_files = self.find_audio_files(directory_path)
-        if not audio_files:
-            print('Аудиофайлы не найдены!')
+            dry_run: bool = False,
+            workers: int = 1,
+            use_ffmpeg: bool = True,
+            chunks: int = 1,
+            prefetch: int = 2,
+            force: bool = False,
+            watch: bool = False,
+            watch_interval: float = 5.0,
+            schedule: str | None = None):
+        if not directory_path.exists():
+            print(f'Ошибка: Папка {directory_path} не существует')
             return
         if output_dir is None:
             output_dir = directory_path
         output_path = Path(output_dir)
         if not dry_run:
             output_path.mkdir(parents=True, exist_ok=True)
-        total_files = len(audio_files)
+        manifest = BatchManifest(output_path, directory_path)
+        audio_files = self.watch_audio_files(directory_path, watch_interval) if watch else self.iter_audio_files(directory_path)
+        found = 0
+        skipped = 0
+
+        def settings_hash(duration: float) -> str:
+            return self._settings_hash(duration, print_segments)
+
+        def iter_jobs():
+            # Files are handed over as the scan finds them, so work starts before the walk finishes
+            nonlocal found, skipped
+            for audio_file in audio_files:
+                found += 1
+                output_file = output_path / f'{audio_file.stem}.txt'
+                if not force and manifest.is_current(audio_file, self.transcript_output(output_file, print_segments).paths, settings_hash):
+                    skipped += 1
+                    continue
+                yield audio_file, output_file
+
+        order = schedule or ('longest' if workers > 1 else 'name')
+        if dry_run:
+            # Planning stays a plain scan, durations are not needed
+            jobs = ((audio_file, output_file, None) for audio_file, output_file in iter_jobs())
+        elif watch or order == 'name':
+            # Each file is probed when it is taken from the scan, so the first one starts right away
+            jobs = ((audio_file, output_file, probe_duration(audio_file)) for audio_file, output_file in iter_jobs())
+        else:
+            # Ordering by duration needs the whole scan and every duration before the first job
+            jobs = self._schedule_jobs(iter_jobs(), order)
+        # Dry runs only read the manifest
+        recorder = None if dry_run else manifest
+        batch = None if dry_run else BatchProgress(self.console)
+        if batch is not None and isinstance(jobs, list):
+            for audio_file, _, duration in jobs:
+                batch.add(audio_file, duration)
         successful = 0
         failed = 0
-        for i, audio_file in enumerate(audio_files, 1):
-            # Light green color for header
-            print(f'\033[92mОбработка файла {i}/{total_files}: {audio_file.name}\033[0m')
-            try:
-                audio_path = Path(audio_file)
-                base_name = audio_path.stem
-                output_file = output_path / f'{base_name}.txt'
-                self.transcribe_russian_audio(audio_path, output_file, print_segments=print_segments, dry_run=dry_run)
-                successful += 1
-            except Exception as e:
-                print(f'Ошибка при обработке {audio_file}: {str(e)}')
-                failed += 1
+        try:
+            with batch or nullcontext():
+                if workers > 1 and not dry_run:
+                    successful, failed = self._batch_transcribe_parallel(jobs, workers, print_segments, use_ffmpeg, recorder, batch, watch)
+                elif prefetch > 0 and not dry_run:
+                    successful, failed = self._batch_transcribe_prefetched(jobs, prefetch, print_segments, use_ffmpeg, chunks, recorder, batch)
+                else:
+                    for i, (audio_path, output_file, duration) in enumerate(jobs, 1):
+                        # Light green color for header
+                        print(f'\033[92mОбработка файла {i}: {audio_path.name}\033[0m')
+                        if batch is not None:
+                            batch.add(audio_path, duration)
+                        try:
+                            file_metrics = self.transcribe_russian_audio(audio_path, output_file, print_segments=print_segments, dry_run=dry_run, use_ffmpeg=use_ffmpeg, chunks=chunks,
+                                echo=batch is None, on_progress=batch.tracker(audio_path) if batch else None, duration=duration)
+                            if recorder is not None:
+                                duration = file_metrics.audio_seconds
+                                recorder.record(audio_path, output_file, duration, self._settings_hash(duration, print_segments))
+                            successful += 1
+                        except Exception as e:
+                            print(f'Ошибка при обработке {audio_path}: {str(e)}')
+                            failed += 1
+                        if batch is not None:
+                            batch.finish(audio_path)
+        except KeyboardInterrupt:
+            if not watch:
+                raise
+            print('\nНаблюдение остановлено.')
+        if not found:
+            print('Аудиофайлы не найдены!')
+            return
         print(f'Пакетная обработка завершена')
         print(f'Успешно обработано: {successful} файлов')
         print(f'Ошибок в файлах: {failed}')
-        print(f'Всего файлов: {total_files}')
+        if skipped:
+            print(f'Пропущено без изменений: {skipped} файлов (--force для повторной обработки)')
+        print(f'Всего файлов: {found}')
         print(f'Результаты сохранены в: {output_path}')
 
+    def _schedule_jobs(self, jobs: Iterable[tuple[Path, Path]], order: str) -> list[tuple[Path, Path, float | None]]:
+        """Probe durations of all jobs in parallel and order them longest or shortest first"""
+        jobs = list(jobs)
+        # Probing is header reads and ffprobe calls, bound by I/O rather than CPU
+        with ThreadPoolExecutor(max_workers=min(16, 2 * (os.cpu_count() or 4)), thread_name_prefix='probe') as pool:
+            durations = list(pool.map(probe_duration, [audio_file for audio_file, _ in jobs]))
+        scheduled = [(audio_file, output_file, duration) for (audio_file, output_file), duration in zip(jobs, durations)]
+        # Files of unknown duration go last in either order
+        if order == 'longest':
+            scheduled.sort(key=lambda job: -(job[2] or 0))
+        else:
+            scheduled.sort(key=lambda job: float('inf') if job[2] is None else job[2])
+        if scheduled:
+            total = sum(duration or 0 for duration in durations)
+            print(f'К обработке: {len(scheduled)} файлов, {total / 3600:.2f} ч аудио')
+        return scheduled
+
+    def _batch_transcribe_prefetched(self, jobs: Iterable[tuple[Path, Path, float | None]], prefetch: int,
+            print_segments: bool, use_ffmpeg: bool, chunks: int, manifest: BatchManifest | None, batch: BatchProgress) -> tuple[int, int]:
+        """Transcribe files one by one while the next `prefetch` files are decoded in background threads"""
+        successful = 0
+        failed = 0
+        # Every scanned file counts towards the batch total right away, not only once it is queued for decoding
+        feed = JobFeed(jobs, on_job=lambda job: batch.add(job[0], job[2]))
+        # The queue holds the current file plus at most `prefetch` decoded ones, which bounds disk and RAM use
+        queued: deque[tuple[Path, Path, float | None, Future | None, FileMetrics]] = deque()
+        with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix='prefetch') as decoder:
+            def fill_queue(block: bool):
+                while len(queued) < prefetch:
+                    # Waiting for new files is only acceptable when nothing else is queued
+                    job = feed.get(block=block and not queued)
+                    if job is None:
+                        return
+                    audio_path, output_file, duration = job
+                    metrics = FileMetrics(audio_path)
+                    # Streamed files are read window by window later, decoding them ahead would defeat that
+                    prepared = None
+                    if not self._is_streamed(duration, chunks):
+                        prepared = decoder.submit(self._get_readable_audio_path_and_info, audio_path, use_ffmpeg=use_ffmpeg, metrics=metrics)
+                    queued.append((audio_path, output_file, duration, prepared, metrics))
+
+            i = 0
+            while True:
+                fill_queue(block=True)
+                if not queued:
+                    break
+                audio_path, output_file, duration, prepared, metrics = queued.popleft()
+                fill_queue(block=False)
+                i += 1
+                # Light green color for header
+                print(f'\033[92mОбработка файла {i}: {audio_path.name}\033[0m')
+                try:
+                    self.transcribe_russian_audio(audio_path, output_file, print_segments=print_segments, echo=False,
+                        use_ffmpeg=use_ffmpeg, on_progress=batch.tracker(audio_path), chunks=chunks, prepared_audio=prepared,
+                        metrics=metrics, duration=duration)
+                    if manifest is not None:
+                        duration = metrics.audio_seconds
+                        manifest.record(audio_path, output_file, duration, self._settings_hash(duration, print_segments))
+                    successful += 1
+                except Exception as e:
+                    print(f'Ошибка при обработке {audio_path}: {str(e)}')
+                    failed += 1
+                batch.finish(audio_path)
+        return successful, failed
+
+    def _batch_transcribe_parallel(self, jobs: Iterable[tuple[Path, Path, float | None]], workers: int, print_segments: bool, use_ffmpeg: bool,
+            manifest: BatchManifest | None, batch: BatchProgress, watch: bool = False) -> tuple[int, int]:
+        """Transcribe files in a pool of worker processes, each with its own model instance"""
+        threads_per_worker = max(1, (os.cpu_count() or self.cpu_threads) // workers)
+        print(f'Запускаем {workers} процессов по {threads_per_worker} потоков CPU')
+        successful = 0
+        failed = 0
+        # The scan (or the watcher) runs in the background, jobs are taken from it only as workers free up
+        feed = JobFeed(jobs, on_job=lambda job: batch.add(job[0], job[2]))
+        max_in_flight = workers * 2
+
+        with multiprocessing.Manager() as manager:
+            events = manager.Queue()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self._worker_kwargs(threads_per_worker), events),
+            ) as pool:
+                outputs = {}
+                submitted: dict[Future, Path] = {}
+                pending = set()
+                broken = None
+                while pending or not (feed.exhausted or broken):
+                    while broken is None and len(pending) < max_in_flight:
+                        # Results of running files are collected while the watcher has nothing new
+                        job = feed.get(block=not pending)
+                        if job is None:
+                            break
+                        audio_file, output_file, duration = job
+                        outputs[audio_file] = output_file
+                        try:
+                            future = pool.submit(_transcribe_in_worker, audio_file, output_file, print_segments, use_ffmpeg, duration)
+                        except BrokenProcessPool as e:
+                            broken = e
+                            failed += 1
+                            batch.finish(audio_file)
+                            break
+                        submitted[future] = audio_file
+                        pending.add(future)
+                    if not pending:
+                        continue
+                    done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                    self._drain_worker_events(events, batch)
+                    for future in done:
+                        try:
+                            audio_file, file_metrics, error = future.result()
+                        except Exception as e:
+                            # A worker died (out of memory, crash in native code): the pool cannot take new jobs
+                            if isinstance(e, BrokenProcessPool):
+                                broken = e
+                            audio_file, file_metrics, error = submitted[future], None, str(e) or type(e).__name__
+                        submitted.pop(future, None)
+                        if error is None:
+                            if self.metrics:
+                                self.metrics.record(file_metrics)
+                            if manifest is not None:
+                                duration = file_metrics['audio_seconds']
+                                manifest.record(audio_file, outputs[audio_file], duration, self._settings_hash(duration, print_segments))
+                            successful += 1
+                            batch.console.print(f'\033[92mГотово:\033[0m {audio_file.name}')
+                        else:
+                            failed += 1
+                            batch.console.print(f'Ошибка при обработке {audio_file}: {error}')
+                        outputs.pop(audio_file, None)
+                        batch.finish(audio_file)
+                if broken is not None:
+                    batch.console.print(f'Пул процессов остановлен: {broken}')
+                    # Files not yet handed to the pool are reported as failed; a watcher is not waited for
+                    while (job := feed.get(block=not watch)) is not None:
+                        failed += 1
+                        batch.finish(job[0])
+        return successful, failed
+
+    def _worker_kwargs(self, cpu_threads: int) -> dict:
+        """Constructor arguments for the transcriber instance of a worker process"""
+        return {
+            'model_name': self.model_name,
+            'device_preference': self.device_preference,
+            'compute_type': self.compute_type,
+            'cpu_threads': cpu_threads,
+            'wav_cache': self.wav_cache,
+            'vad_cache': self.vad_cache,
+            'output_formats': self.output_formats,
+            'flush_interval': self.flush_interval,
+            'fsync': self.fsync,
+            'cascade_model': self.cascade_model,
+            'cascade_thresholds': self.cascade_thresholds,
+            'stream_threshold': self.stream_threshold,
+        }
+
+    def _drain_worker_events(self, events, batch: BatchProgress):
+        while True:
+            try:
+                audio_file, completed, total = events.get_nowait()
+            except queue.Empty:
+                return
+            batch.update(Path(audio_file), completed, total)
+
     def batch_transcribe(self, audio_files, print_segments=False, dry_run: bool = False):
         for audio_file in audio_files:
             print(f'\n{"="*50}')
             self.transcribe_russian_audio(audio_file, print_segments=print_segments, dry_run=dry_run)
 
+# Per-process state of batch worker processes, set up by _init_worker
+_worker_transcriber: RussianWhisperTranscriber | None = None
+_worker_events = None
+_worker_load_error: str | None = None
+
+
+def _init_worker(transcriber_kwargs: dict, events):
+    global _worker_transcriber, _worker_events, _worker_load_error
+    # Workers report through the parent's progress view, so their own output is muted
+    sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+    _worker_events = events
+    _worker_transcriber = RussianWhisperTranscriber(**transcriber_kwargs)
+    # Load the model while the pool starts rather than on the first job
+    try:
+        _worker_transcriber.model
+    except Exception as e:
+        # Raising here would break the whole pool, the error is reported with every job instead
+        _worker_load_error = f'не удалось загрузить модель {transcriber_kwargs.get("model_name")}: {e}'
+
+
+def _transcribe_in_worker(audio_file: Path, output_file: Path, print_segments: bool, use_ffmpeg: bool,
+        duration: float | None = None) -> tuple[Path, dict | None, str | None]:
+    def report(completed: float, total: float):
+        _worker_events.put((str(audio_file), completed, total))
+
+    if _worker_load_error:
+        return audio_file, None, _worker_load_error
+    try:
+        metrics = _worker_transcriber.transcribe_russian_audio(
+            audio_file,
+            output_file,
+            print_segments=print_segments,
+            echo=False,
+            use_ffmpeg=use_ffmpeg,
+            on_progress=report,
+            duration=duration,
+        )
+    except Exception as e:
+        return audio_file, None, str(e)
+    return audio_file, metrics.to_dict(), None
+
+
+def _transcribe_chunk_in_worker(audio_chunk: np.ndarray, time_offset: float, speech: list[tuple[float, float]]) -> list[AdjustedSegment]:
+    if _worker_load_error:
+        raise RuntimeError(_worker_load_error)
+    duration = len(audio_chunk) / SAMPLE_RATE
+    # VAD already ran over the whole file in the parent, workers decode only the speech regions
+    segments, _ = _worker_transcriber._transcribe_audio_with_duration_strategy(audio_chunk, duration, speech=speech)
+    return [AdjustedSegment(segment, time_offset) for segment in segments]
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class TranscriptionJob:
+    def __init__(self, job_id: str, audio_file: Path, output_file: Path, print_segments: bool, model_name: str):
+        self.id = job_id
+        self.audio_file = audio_file
+        self.output_file = output_file
+        self.print_segments = print_segments
+        self.model_name = model_name
+        self.status = 'queued'
+        self.error = None
+        self.duration = None
+        self.segments = []
+        self.cancel_requested = threading.Event()
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def add_segment(self, segment):
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+        with self.changed:
+            self.segments.append({'start': segment.start, 'end': segment.end, 'text': segment.text.strip()})
+            self.changed.notify_all()
+
+    def set_status(self, status: str, error: str | None = None):
+        with self.changed:
+            self.status = status
+            self.error = error
+            self.changed.notify_all()
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'audio': str(self.audio_file),
+            'output': str(self.output_file),
+            'model': self.model_name,
+            'status': self.status,
+            'error': self.error,
+            'duration': self.duration,
+            'segments': len(self.segments),
+        }
+
+
+class TranscriptionServer:
+    """Keeps models loaded between jobs and serves a small JSON API over local HTTP"""
+    # Finished jobs kept for status queries
+    MAX_FINISHED_JOBS = 1000
+
+    def __init__(self, host: str = DEFAULT_SERVER_HOST, port: int = DEFAULT_SERVER_PORT, queue_size: int = 16,
+            runners: int = 1, model_names: Iterable[str] = ('turbo',), tunings: dict[str, dict] | None = None, **transcriber_kwargs):
+        self.transcriber_kwargs = transcriber_kwargs
+        # --autotune choices are per model, each loaded model gets its own
+        self.tunings = tunings or {}
+        self.transcribers: dict[str, RussianWhisperTranscriber] = {}
+        self.transcribers_lock = threading.Lock()
+        self.jobs: dict[str, TranscriptionJob] = {}
+        self.jobs_lock = threading.Lock()
+        self.queue: queue.Queue[TranscriptionJob] = queue.Queue(maxsize=queue_size)
+        self.runners = runners
+        # Only models loaded at startup are served, clients cannot make the server load others
+        self.model_names = list(model_names)
+        for model_name in self.model_names:
+            self._get_transcriber(model_name)
+        self.httpd = ThreadingHTTPServer((host, port), _ServerRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.transcription_server = self
+
+    def _get_transcriber(self, model_name: str) -> RussianWhisperTranscriber:
+        with self.transcribers_lock:
+            if model_name not in self.transcribers:
+                print(f'Загружаем модель {model_name}...')
+                kwargs = dict(self.transcriber_kwargs)
+                tuning = self.tunings.get(model_name)
+                if tuning:
+                    kwargs.update(device_preference=tuning['device'], compute_type=tuning['compute_type'], cpu_threads=os.cpu_count() or tuning['cpu_threads'])
+                transcriber = RussianWhisperTranscriber(model_name=model_name, **kwargs)
+                transcriber.model
+                self.transcribers[model_name] = transcriber
+            return self.transcribers[model_name]
+
+    def submit(self, payload: dict) -> TranscriptionJob:
+        """Queue a job, raises queue.Full when the queue is at its limit"""
+        audio_file = Path(payload['audio'])
+        if not audio_file.is_file():
+            raise ValueError(f'{audio_file} не является файлом')
+        output_file = Path(payload['output']) if payload.get('output') else audio_file.with_suffix('.txt')
+        self._check_output(output_file)
+        model_name = payload.get('model') or self.model_names[0]
+        if model_name not in self.model_names:
+            raise ValueError(f'модель {model_name} не загружена, доступны: {", ".join(self.model_names)}')
+        job = TranscriptionJob(uuid.uuid4().hex[:12], audio_file, output_file, bool(payload.get('segments')), model_name)
+        self.queue.put_nowait(job)
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+            self._forget_old_jobs()
+        return job
+
+    def _check_output(self, output_file: Path):
+        """Jobs may only write transcripts: an absolute .txt path and its format siblings, never links or special files"""
+        if not output_file.is_absolute() or output_file.suffix.lower() != '.txt':
+            raise ValueError(f'{output_file}: результат должен быть абсолютным путём к файлу .txt')
+        if not output_file.parent.is_dir():
+            raise ValueError(f'{output_file.parent} не является папкой')
+        formats = self.transcriber_kwargs.get('output_formats', ('txt',))
+        for path in TranscriptOutput(output_file, formats, False).paths:
+            if path.is_symlink() or (path.exists() and not path.is_file()):
+                raise ValueError(f'{path} существует и не является обычным файлом')
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id: str) -> TranscriptionJob | None:
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> TranscriptionJob | None:
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        if job.status == 'queued':
+            job.set_status('cancelled')
+        return job
+
+    def _run_jobs(self):
+        while True:
+            job = self.queue.get()
+            if job.cancel_requested.is_set():
+                continue
+            job.set_status('running')
+            print(f'\033[92mЗадание {job.id}:\033[0m {job.audio_file}')
+            try:
+                transcriber = self._get_transcriber(job.model_name)
+                metrics = transcriber.transcribe_russian_audio(
+                    job.audio_file,
+                    job.output_file,
+                    print_segments=job.print_segments,
+                    echo=False,
+                    on_segment=job.add_segment,
+                )
+                job.duration = metrics.audio_seconds
+                job.set_status('done')
+            except JobCancelled:
+                job.set_status('cancelled')
+            except Exception as e:
+                job.set_status('failed', str(e))
+
+    def serve_forever(self):
+        for i in range(self.runners):
+            threading.Thread(target=self._run_jobs, name=f'runner-{i}', daemon=True).start()
+        host, port = self.httpd.server_address[:2]
+        print(f'Сервер распознавания запущен: http://{host}:{port}')
+        self.httpd.serve_forever()
+
+
+class _ServerRequestHandler(BaseHTTPRequestHandler):
+    # GET    /health               server status
+    # POST   /jobs                 {"audio": ..., "output": ..., "segments": bool, "model": ...}
+    # GET    /jobs/<id>            job status
+    # DELETE /jobs/<id>            cancel job
+    # GET    /jobs/<id>/segments   segments as JSON lines while they are decoded
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def server_state(self) -> TranscriptionServer:
+        return self.server.transcription_server
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_or_404(self, job_id: str) -> TranscriptionJob | None:
+        job = self.server_state.get_job(job_id)
+        if job is None:
+            self._send_json(404, {'error': 'задание не найдено'})
+        return job
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if parts == ['health']:
+            self._send_json(200, {
+                'status': 'ok',
+                'models': list(self.server_state.transcribers),
+                'queued': self.server_state.queue.qsize(),
+            })
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job_or_404(parts[1])
+            if job:
+                self._send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'segments':
+            job = self._job_or_404(parts[1])
+            if job:
+                self._stream_segments(job)
+        else:
+            self._send_json(404, {'error': 'неизвестный путь'})
+
+    def do_POST(self):
+        if self.path.strip('/') != 'jobs':
+            self._send_json(404, {'error': 'неизвестный путь'})
+            return
+        # Browsers can send text/plain cross-origin without a preflight, JSON requests need one that we never answer
+        if self.headers.get_content_type() != 'application/json':
+            self._send_json(415, {'error': 'требуется Content-Type: application/json'})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError('ожидается объект JSON')
+            job = self.server_state.submit(payload)
+        except queue.Full:
+            self._send_json(503, {'error': 'очередь заданий заполнена'})
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {'error': str(e)})
+        else:
+            self._send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send_json(404, {'error': 'неизвестный путь'})
+            return
+        job = self.server_state.cancel(parts[1])
+        if job is None:
+            self._send_json(404, {'error': 'задание не найдено'})
+        else:
+            self._send_json(200, job.to_dict())
+
+    def _stream_segments(self, job: TranscriptionJob):
+        # No Content-Length: the response ends when the connection closes after the final status line
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+        sent = 0
+        while True:
+            with job.changed:
+                job.changed.wait_for(lambda: len(job.segments) > sent or job.finished, timeout=30)
+                pending = job.segments[sent:]
+                finished = job.finished
+            for segment in pending:
+                self.wfile.write((json.dumps(segment, ensure_ascii=False) + '\n').encode('utf-8'))
+            sent += len(pending)
+            if finished:
+                self.wfile.write((json.dumps(job.to_dict(), ensure_ascii=False) + '\n').encode('utf-8'))
+                return
+            self.wfile.flush()
+
+
+def _server_url() -> str:
+    return os.environ.get('RUSSIAN_WHISPER_SERVER') or f'http://{DEFAULT_SERVER_HOST}:{DEFAULT_SERVER_PORT}'
+
+
+def _server_models(server_url: str) -> list[str]:
+    """Models served by a running server, empty when no server answers"""
+    try:
+        with urllib.request.urlopen(f'{server_url}/health', timeout=0.3) as response:
+            return json.load(response).get('models', []) if response.status == 200 else []
+    except (OSError, ValueError):
+        return []
+
+
+def _transcribe_via_server(server_url: str, audio_file: Path, output_file: Path | None, print_segments: bool, model_name: str) -> bool:
+    """Send a file to a running server and print its segments as they arrive"""
+    payload = {
+        'audio': str(audio_file.resolve()),
+        'output': str(output_file.resolve()) if output_file else None,
+        'segments': print_segments,
+        'model': model_name,
+    }
+    request = urllib.request.Request(f'{server_url}/jobs', data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST')
+    while True:
+        try:
+            with urllib.request.urlopen(request) as response:
+                job = json.load(response)
+            break
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                print(f'Ошибка сервера: {json.load(e).get("error")}')
+                return False
+            # Queue is full, wait for a free slot
+            time.sleep(1)
+    print(f'  Задание {job["id"]} отправлено на сервер {server_url}')
+    print(f'  Сохраняем в \033[92m{Path(job["output"]).name}\033[0m')
+    try:
+        with urllib.request.urlopen(f'{server_url}/jobs/{job["id"]}/segments') as response:
+            for raw_line in response:
+                data = json.loads(raw_line)
+                if 'status' in data:
+                    job = data
+                    continue
+                print(f'[{data["start"]:.2f} -> {data["end"]:.2f}] {data["text"]}' if print_segments else data['text'])
+    except KeyboardInterrupt:
+        urllib.request.urlopen(urllib.request.Request(f'{server_url}/jobs/{job["id"]}', method='DELETE'))
+        raise
+    if job['status'] != 'done':
+        print(f'Задание завершилось со статусом {job["status"]}: {job.get("error") or ""}')
+        return False
+    return True
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _benchmark_case(case: dict, audio: np.ndarray, vad_filter: bool) -> dict:
+    """Run one benchmark configuration, called in a fresh process so peak RSS belongs to this case only"""
+    result = {**case, 'audio_seconds': len(audio) / SAMPLE_RATE}
+    try:
+        load_start = time.perf_counter()
+        from faster_whisper import WhisperModel
+        transcriber = RussianWhisperTranscriber(model_name=case['model'], cpu_threads=case['cpu_threads'])
+        transcriber.model = WhisperModel(case['model'], device=case['device'], compute_type=case['compute_type'], cpu_threads=case['cpu_threads'])
+        result['load_seconds'] = time.perf_counter() - load_start
+
+        params = {
+            **transcriber._get_base_params(),
+            **transcriber._get_transcription_params(result['audio_seconds']),
+            'beam_size': case['beam_size'],
+            'best_of': case['beam_size'],
+            'vad_filter': vad_filter,
+            # No temperature fallback and no prompt carry-over: sampling at T>0 on low-confidence output
+            # (always the case for the synthetic signal) would make timings differ between runs and commits
+            'temperature': 0.0,
+            'condition_on_previous_text': False,
+        }
+        start = time.perf_counter()
+        segments, _ = transcriber.model.transcribe(audio, **params)
+        first_segment = None
+        count = 0
+        for _ in segments:
+            if first_segment is None:
+                first_segment = time.perf_counter() - start
+            count += 1
+        wall = time.perf_counter() - start
+        result.update({
+            'wall_seconds': wall,
+            'rtf': wall / result['audio_seconds'],
+            'first_segment_seconds': first_segment,
+            'segments': count,
+        })
+    except Exception as e:
+        result['error'] = str(e)
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def _benchmark_audio(source: Path | None, duration: int) -> np.ndarray:
+    """Leading `duration` seconds of the source file, repeated if it is shorter, or a seeded synthetic signal"""
+    samples = duration * SAMPLE_RATE
+    if source is not None:
+        from faster_whisper import decode_audio
+        audio = decode_audio(str(source), sampling_rate=SAMPLE_RATE)
+        return np.resize(audio, samples)
+    # Harmonic tones with a syllable-rate envelope; enough to keep the decoder busy, not to measure accuracy
+    rng = np.random.default_rng(0)
+    t = np.arange(samples) / SAMPLE_RATE
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 4 * t) > -0.3).astype(np.float32)
+    return (0.3 * voice * envelope + 0.01 * rng.standard_normal(samples)).astype(np.float32)
+
+
+def run_benchmark(source: Path | None, models: list[str], devices: list[str], compute_types: list[str],
+        cpu_threads: list[int], beam_sizes: list[int], durations: list[int], output_prefix: Path):
+    """Measure real-time factor, time to first segment and peak RSS for every combination of settings"""
+    import csv
+    import ctranslate2
+    import platform
+
+    cases = []
+    for device in devices:
+        supported = ctranslate2.get_supported_compute_types(device)
+        for compute_type in compute_types:
+            if compute_type not in supported:
+                print(f'Пропускаем {device}/{compute_type}: не поддерживается на этой машине')
+                continue
+            # Thread count only matters on CPU
+            for threads in (cpu_threads if device == 'cpu' else cpu_threads[:1]):
+                for model in models:
+                    for beam_size in beam_sizes:
+                        cases.append({'model': model, 'device': device, 'compute_type': compute_type,
+                            'cpu_threads': threads, 'beam_size': beam_size})
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'source': str(source) if source else 'synthetic',
+        'results': [],
+    }
+    # Synthetic audio contains no speech, VAD would drop all of it
+    vad_filter = source is not None
+    total = len(cases) * len(durations)
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+        for duration in durations:
+            audio = _benchmark_audio(source, duration)
+            for case in cases:
+                print(f'[{len(report["results"]) + 1}/{total}] {duration}с {case["model"]} {case["device"]}/{case["compute_type"]} '
+                      f'потоков={case["cpu_threads"]} beam={case["beam_size"]}')
+                result = pool.submit(_benchmark_case, case, audio, vad_filter).result()
+                if 'error' in result:
+                    print(f'  Ошибка: {result["error"]}')
+                else:
+                    print(f'  RTF {result["rtf"]:.3f}, первый сегмент {result["first_segment_seconds"] or 0:.2f}с, '
+                          f'пик памяти {result["peak_rss_mb"] or 0:.0f} МБ')
+                report['results'].append(result)
+
+    json_path = output_prefix.with_suffix('.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    csv_path = output_prefix.with_suffix('.csv')
+    fields = ['model', 'device', 'compute_type', 'cpu_threads', 'beam_size', 'audio_seconds', 'load_seconds',
+        'wall_seconds', 'rtf', 'first_segment_seconds', 'segments', 'peak_rss_mb', 'error']
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(report['results'])
+    print(f'Отчёт сохранён: {json_path}, {csv_path}')
+
+
+class AutotuneStore:
+    """Per host and model choice of device, compute type and thread/worker split, found by --autotune"""
+    def __init__(self, path: Path | None = None):
+        self.path = path or self.default_path()
+
+    @staticmethod
+    def default_path() -> Path:
+        if sys.platform == 'win32' and os.environ.get('APPDATA'):
+            return Path(os.environ['APPDATA']) / 'russian-whisper' / 'autotune.json'
+        return Path(os.environ.get('XDG_CONFIG_HOME') or Path.home() / '.config') / 'russian-whisper' / 'autotune.json'
+
+    @staticmethod
+    def _key(model_name: str) -> str:
+        return f'{socket.gethostname()}|{model_name}'
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, model_name: str) -> dict | None:
+        return self._load().get(self._key(model_name))
+
+    def put(self, model_name: str, choice: dict):
+        data = self._load()
+        data[self._key(model_name)] = choice
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def _word_error_rate(reference: str, hypothesis: str) -> float:
+    ref = re.findall(r'\w+', reference.lower())
+    hyp = re.findall(r'\w+', hypothesis.lower())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _autotune_candidates(cpu_count: int) -> list[dict]:
+    import ctranslate2
+
+    candidates = []
+    if ctranslate2.get_cuda_device_count():
+        supported = ctranslate2.get_supported_compute_types('cuda')
+        for compute_type in ('float16', 'int8_float16', 'int8'):
+            if compute_type in supported:
+                candidates.append({'device': 'cuda', 'compute_type': compute_type, 'cpu_threads': cpu_count, 'workers': 1})
+    supported = ctranslate2.get_supported_compute_types('cpu')
+    for compute_type in ('int8', 'int8_float32', 'float32'):
+        if compute_type not in supported:
+            continue
+        workers = 1
+        # Splits from one process with all cores to processes with two threads each
+        while cpu_count // workers >= 2:
+            candidates.append({'device': 'cpu', 'compute_type': compute_type, 'cpu_threads': cpu_count // workers, 'workers': workers})
+            workers *= 2
+    return candidates
+
+
+def run_autotune(calibration_file: Path, model_name: str, wer_threshold: float, store: AutotuneStore, clip_seconds: int = 60) -> dict | None:
+    """Time a calibration clip on every available configuration and store the fastest one that stays accurate"""
+    from faster_whisper import decode_audio
+
+    audio = decode_audio(str(calibration_file), sampling_rate=SAMPLE_RATE)[:clip_seconds * SAMPLE_RATE]
+    cpu_count = os.cpu_count() or 4
+    candidates = _autotune_candidates(cpu_count)
+    # The most precise configuration provides the reference transcript for the accuracy check
+    reference_candidate = next((c for c in candidates if c['compute_type'] in ('float16', 'float32') and c['workers'] == 1), candidates[0])
+    reference = None
+    results = []
+    for candidate in [reference_candidate] + [c for c in candidates if c is not reference_candidate]:
+        label = f'{candidate["device"]}/{candidate["compute_type"]}, {candidate["workers"]} x {candidate["cpu_threads"]} потоков'
+        print(f'  {label}...')
+        kwargs = {
+            'model_name': model_name,
+            'device_preference': candidate['device'],
+            'compute_type': candidate['compute_type'],
+            'cpu_threads': candidate['cpu_threads'],
+        }
+        try:
+            with multiprocessing.Manager() as manager:
+                # Workers load their models first and start decoding together, so the timing is pure throughput
+                barrier = manager.Barrier(candidate['workers'])
+                with ProcessPoolExecutor(max_workers=candidate['workers'], initializer=_init_worker, initargs=(kwargs, None)) as pool:
+                    runs = list(pool.map(_autotune_in_worker, [audio] * candidate['workers'], [barrier] * candidate['workers']))
+        except Exception as e:
+            print(f'    Ошибка: {e}')
+            continue
+        wall = max(elapsed for elapsed, _ in runs)
+        text = runs[0][1]
+        if reference is None:
+            reference = text
+        result = {
+            **candidate,
+            # Seconds of compute per second of audio over the whole machine
+            'rtf': wall / (len(audio) / SAMPLE_RATE * candidate['workers']),
+            'wer': _word_error_rate(reference, text),
+        }
+        print(f'    RTF {result["rtf"]:.3f}, WER относительно эталона {result["wer"]:.3f}')
+        results.append(result)
+
+    accurate = [result for result in results if result['wer'] <= wer_threshold]
+    if not accurate:
+        print('Ни одна конфигурация не прошла проверку точности.')
+        return None
+    choice = min(accurate, key=lambda result: result['rtf'])
+    choice['created'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    store.put(model_name, choice)
+    print(f'Выбрано: {choice["device"]}/{choice["compute_type"]}, {choice["workers"]} процессов по {choice["cpu_threads"]} потоков '
+          f'(RTF {choice["rtf"]:.3f}). Сохранено в {store.path}')
+    return choice
+
+
+def _autotune_in_worker(audio: np.ndarray, barrier) -> tuple[float, str]:
+    barrier.wait()
+    start = time.perf_counter()
+    segments, _ = _worker_transcriber._transcribe_audio_with_duration_strategy(audio, len(audio) / SAMPLE_RATE)
+    text = ' '.join(segment.text.strip() for segment in segments)
+    return time.perf_counter() - start, text
+
+
+def _pop_option(argv: list[str], name: str) -> str | None:
+    """Remove `name <value>` from argv and return the value"""
+    if name not in argv:
+        return None
+    idx = argv.index(name)
+    if idx + 1 >= len(argv):
+        print(f'Ошибка: {name} требует значение')
+        sys.exit(1)
+    value = argv[idx + 1]
+    del argv[idx:idx + 2]
+    return value
+
+
+def _pop_list_option(argv: list[str], name: str, default: str, cast: Callable = str) -> list:
+    """Remove `name a,b,c` from argv and return the values"""
+    value = _pop_option(argv, name) or default
+    try:
+        return [cast(item) for item in value.split(',') if item]
+    except ValueError:
+        print(f'Ошибка: неверное значение {name}: {value}')
+        sys.exit(1)
+
+
+def _pop_int_option(argv: list[str], name: str, minimum: int = 0) -> int | None:
+    """Remove `name <value>` from argv and return the value as int"""
+    value = _pop_option(argv, name)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        print(f'Ошибка: {name} требует целое число')
+        sys.exit(1)
+    if number < minimum:
+        print(f'Ошибка: {name} должно быть не меньше {minimum}')
+        sys.exit(1)
+    return number
+
+
+def _pop_float_option(argv: list[str], name: str, minimum: float | None = 0) -> float | None:
+    """Remove `name <value>` from argv and return the value as float"""
+    value = _pop_option(argv, name)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        print(f'Ошибка: {name} требует число')
+        sys.exit(1)
+    if minimum is not None and number < minimum:
+        print(f'Ошибка: {name} должно быть не меньше {minimum}')
+        sys.exit(1)
+    return number
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print('Использование:')
-        print('  Один файл: python transcribe.py <аудиофайл> [файл_результата] [--segments] [--dry-run] [--resume-time <секунды>]')
-        print('  Папка:     python transcribe.py <папка_аудио> [папка_результата] [--segments] [--dry-run] [--resume-time <секунды>]')
+        print('  Один файл: python transcribe.py <аудиофайл> [файл_результата] [--segments] [--dry-run] [--resume-time <секунды>] [--chunks <N>] [--wav-cache] [--vad-cache] [--cache-dir <папка>] [--cache-size <МБ>]')
+        print('  Папка:     python transcribe.py <папка_аудио> [папка_результата] [--segments] [--dry-run] [--workers <N>] [--prefetch <K>] [--force] [--watch [--watch-interval <секунды>]] [--schedule longest|shortest|name]')
+        print('  Метрики:   [--metrics-jsonl <файл>] [--metrics-prom <файл>]')
+        print('  Форматы:   [--formats txt,srt,vtt,json,jsonl] [--flush-interval <секунды>] [--fsync]')
+        print('  Окна:      [--stream-threshold <секунды>] (длинные файлы читаются окнами, 0 — отключить)')
+        print('  Каскад:    [--cascade small] [--cascade-logprob -0.8] [--cascade-compression 2.4] [--cascade-no-speech 0.5]')
         print()
         print('Примеры:')
         print('  python transcribe.py speech.mp3 transcript.txt')
@@ -352,20 +2442,44 @@ if __name__ == '__main__':
         print('  python transcribe.py /path/to/audio/files /path/to/output --segments')
         print('  python transcribe.py /path/to/audio/files /path/to/output --dry-run')
         print('  python transcribe.py /path/to/audio/files /path/to/output --resume-time 120')
+        print('  python transcribe.py /path/to/audio/files /path/to/output --workers 8')
+        print('  python transcribe.py long_podcast.mp3 --chunks 8')
+        print()
+        print('Кэш WAV:')
+        print('  python transcribe.py --cache-stats [--cache-dir <папка>]')
+        print('  python transcribe.py --cache-prune [--cache-dir <папка>] [--cache-size <МБ>]')
+        print()
+        print('Сервер (модели остаются загруженными между запусками):')
+        print('  python transcribe.py --serve [--host 127.0.0.1] [--port 8765] [--queue-size 16] [--models turbo,small]')
+        print('  Пока сервер запущен, обработка одного файла отправляется на него (--server <url> или --no-server)')
+        print()
+        print('Подбор устройства, compute_type и числа потоков (результат сохраняется для этой машины и модели):')
+        print('  python transcribe.py --autotune <аудиофайл_с_речью> [--model turbo] [--wer-threshold 0.1]')
+        print('  Сохранённый выбор применяется автоматически, --no-autotune его игнорирует, --model выбирает модель')
+        print()
+        print('Замер скорости:')
+        print('  python transcribe.py --benchmark [--benchmark-audio <файл>] [--models turbo,small] [--devices cpu,cuda]')
+        print('      [--compute-types float16,int8,int8_float32,float32] [--threads 4,8] [--beam-sizes 1,5]')
+        print('      [--durations 30,120,600] [--benchmark-output <префикс>]')
         sys.exit(1)
     if sys.argv[1] in ('-d', '--diagnostics'):
-        import torch
-        print(f"PyTorch version: {torch.__version__}")
-        print(f"CUDA available: {torch.cuda.is_available()}")
-        if torch.cuda.is_available():
-            print(f"CUDA version: {torch.version.cuda}") # type: ignore
-            print(f"GPU count: {torch.cuda.device_count()}")
-            current_device = torch.cuda.current_device()
-            print(f"Current GPU: {current_device} ({torch.cuda.get_device_name(current_device)})")
-            gpu_memory_gb = torch.cuda.get_device_properties(current_device).total_memory / (1024**3)
-            gpu_free_memory_gb = (torch.cuda.get_device_properties(current_device).total_memory - torch.cuda.memory_allocated(current_device)) / (1024**3)
-            print(f"Total GPU memory: {gpu_memory_gb:.1f} GB")
-            print(f"Free GPU memory: {gpu_free_memory_gb:.1f} GB")
+        # ctranslate2 is what actually runs the model, asking it avoids importing torch
+        import ctranslate2
+        print(f"CTranslate2 version: {ctranslate2.__version__}")
+        print(f"CPU compute types: {', '.join(sorted(ctranslate2.get_supported_compute_types('cpu')))}")
+        cuda_count = ctranslate2.get_cuda_device_count()
+        print(f"CUDA available: {cuda_count > 0}")
+        if cuda_count:
+            print(f"GPU count: {cuda_count}")
+            print(f"CUDA compute types: {', '.join(sorted(ctranslate2.get_supported_compute_types('cuda')))}")
+            nvidia_smi = shutil.which('nvidia-smi')
+            if nvidia_smi:
+                query = subprocess.run(
+                    [nvidia_smi, '--query-gpu=index,name,memory.total,memory.free', '--format=csv,noheader,nounits'],
+                    capture_output=True, text=True)
+                for line in query.stdout.strip().splitlines():
+                    index, name, total_mb, free_mb = [part.strip() for part in line.split(',')]
+                    print(f"GPU {index}: {name}, total memory {int(total_mb) / 1024:.1f} GB, free {int(free_mb) / 1024:.1f} GB")
             print(""" Model memory requirements:
     tiny: 0.5
     base: 1.0
@@ -381,6 +2495,121 @@ if __name__ == '__main__':
     print_segments = '--segments' in sys.argv
     dry_run = '--dry-run' in sys.argv
     use_ffmpeg = '--no-ffmpeg' not in sys.argv
+    force = '--force' in sys.argv
+    watch = '--watch' in sys.argv
+    watch_interval = _pop_int_option(sys.argv, '--watch-interval', minimum=1) or 5
+    cache_dir = _pop_option(sys.argv, '--cache-dir')
+    cache_size_mb = _pop_int_option(sys.argv, '--cache-size', minimum=0)
+    cache_key = _pop_option(sys.argv, '--cache-key') or 'content'
+    if cache_key not in ('content', 'path'):
+        print('Ошибка: --cache-key должно быть content или path')
+        sys.exit(1)
+    wav_cache = None
+    # --cache-dir only sets the location, the disk cache stays opt-in
+    if '--wav-cache' in sys.argv or sys.argv[1] in ('--cache-stats', '--cache-prune'):
+        wav_cache = WavCache(
+            Path(cache_dir) if cache_dir else None,
+            max_bytes=DEFAULT_CACHE_SIZE if cache_size_mb is None else cache_size_mb * 1024**2,
+            content_keys=cache_key == 'content',
+        )
+    if sys.argv[1] == '--cache-stats':
+        count, size = wav_cache.stats()
+        print(f'Кэш WAV: {wav_cache.directory}')
+        print(f'Файлов: {count}, размер: {size / 1024**2:.1f} МБ из {wav_cache.max_bytes / 1024**2:.0f} МБ')
+        vad_cache = VadCache(wav_cache.directory / 'vad')
+        print(f'Кэш VAD: {len(vad_cache.entries())} из {vad_cache.max_entries} записей')
+        sys.exit(0)
+    if sys.argv[1] == '--cache-prune':
+        removed, freed = wav_cache.prune()
+        print(f'Удалено файлов: {removed}, освобождено {freed / 1024**2:.1f} МБ')
+        removed = VadCache(wav_cache.directory / 'vad').prune()
+        print(f'Удалено записей VAD: {removed}')
+        sys.exit(0)
+    metrics_jsonl = _pop_option(sys.argv, '--metrics-jsonl')
+    metrics_prom = _pop_option(sys.argv, '--metrics-prom')
+    metrics = None
+    if metrics_jsonl or metrics_prom:
+        metrics = MetricsExporter(Path(metrics_jsonl) if metrics_jsonl else None, Path(metrics_prom) if metrics_prom else None)
+    model_name = _pop_option(sys.argv, '--model') or 'turbo'
+    if sys.argv[1] == '--autotune':
+        wer_threshold = _pop_float_option(sys.argv, '--wer-threshold')
+        calibration = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+        if not calibration or not Path(calibration[0]).is_file():
+            print('Ошибка: --autotune требует аудиофайл с русской речью для калибровки')
+            sys.exit(1)
+        print(f'Подбор конфигурации для модели {model_name} на {socket.gethostname()}')
+        choice = run_autotune(Path(calibration[0]), model_name, 0.1 if wer_threshold is None else wer_threshold, AutotuneStore())
+        sys.exit(0 if choice else 1)
+    # Configuration chosen by --autotune on this host is reused unless --no-autotune is given
+    tuning = None if '--no-autotune' in sys.argv else AutotuneStore().get(model_name)
+    vad_cache = None
+    if '--vad-cache' in sys.argv:
+        vad_cache = VadCache(Path(cache_dir) / 'vad' if cache_dir else None)
+    output_formats = _pop_list_option(sys.argv, '--formats', 'txt')
+    unknown_formats = [fmt for fmt in output_formats if fmt not in OUTPUT_WRITERS]
+    if unknown_formats:
+        print(f'Ошибка: неизвестный формат {", ".join(unknown_formats)}, доступны: {", ".join(OUTPUT_WRITERS)}')
+        sys.exit(1)
+    flush_interval = _pop_float_option(sys.argv, '--flush-interval')
+    stream_threshold = _pop_float_option(sys.argv, '--stream-threshold')
+    cascade_thresholds = {
+        key: value for key, value in (
+            ('avg_logprob', _pop_float_option(sys.argv, '--cascade-logprob', minimum=None)),
+            ('compression_ratio', _pop_float_option(sys.argv, '--cascade-compression')),
+            ('no_speech_prob', _pop_float_option(sys.argv, '--cascade-no-speech')),
+        ) if value is not None
+    }
+    transcriber_kwargs = {'model_name': model_name, 'wav_cache': wav_cache, 'vad_cache': vad_cache, 'metrics': metrics,
+        'output_formats': output_formats, 'flush_interval': 5.0 if flush_interval is None else flush_interval, 'fsync': '--fsync' in sys.argv,
+        'cascade_model': _pop_option(sys.argv, '--cascade'), 'cascade_thresholds': cascade_thresholds,
+        'stream_threshold': DEFAULT_STREAM_THRESHOLD if stream_threshold is None else stream_threshold}
+    if tuning:
+        # The stored thread count is per worker of the tuned pool, a pool splits cores the same way (cpu_count // workers);
+        # single files, --chunks and the parent process use every core
+        transcriber_kwargs.update(device_preference=tuning['device'], compute_type=tuning['compute_type'], cpu_threads=os.cpu_count() or tuning['cpu_threads'])
+    if sys.argv[1] == '--serve':
+        model_names = (_pop_option(sys.argv, '--models') or 'turbo').split(',')
+        # Model and tuned device settings are chosen per loaded model, everything else is shared
+        server_kwargs = {key: value for key, value in transcriber_kwargs.items()
+                         if key not in ('model_name', 'device_preference', 'compute_type', 'cpu_threads')}
+        server = TranscriptionServer(
+            host=_pop_option(sys.argv, '--host') or DEFAULT_SERVER_HOST,
+            port=_pop_int_option(sys.argv, '--port', minimum=1) or DEFAULT_SERVER_PORT,
+            queue_size=_pop_int_option(sys.argv, '--queue-size', minimum=1) or 16,
+            model_names=model_names,
+            tunings={} if '--no-autotune' in sys.argv else {name: AutotuneStore().get(name) for name in model_names},
+            **server_kwargs,
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print('\nСервер остановлен.')
+        sys.exit(0)
+    if sys.argv[1] == '--benchmark':
+        import ctranslate2
+        benchmark_audio = _pop_option(sys.argv, '--benchmark-audio')
+        run_benchmark(
+            source=Path(benchmark_audio) if benchmark_audio else None,
+            models=_pop_list_option(sys.argv, '--models', 'turbo'),
+            devices=_pop_list_option(sys.argv, '--devices', 'cuda' if ctranslate2.get_cuda_device_count() else 'cpu'),
+            compute_types=_pop_list_option(sys.argv, '--compute-types', 'float16,int8,int8_float32,float32'),
+            cpu_threads=_pop_list_option(sys.argv, '--threads', str(os.cpu_count() or 4), int),
+            beam_sizes=_pop_list_option(sys.argv, '--beam-sizes', '5', int),
+            durations=_pop_list_option(sys.argv, '--durations', '30,120,600', int),
+            output_prefix=Path(_pop_option(sys.argv, '--benchmark-output') or f'benchmark-{time.strftime("%Y%m%d-%H%M%S")}'),
+        )
+        sys.exit(0)
+    server_url = _pop_option(sys.argv, '--server') or _server_url()
+    use_server = '--no-server' not in sys.argv
+    workers = _pop_int_option(sys.argv, '--workers', minimum=1) or (tuning['workers'] if tuning else 1)
+    chunks = _pop_int_option(sys.argv, '--chunks', minimum=1) or 1
+    prefetch = _pop_int_option(sys.argv, '--prefetch', minimum=0)
+    schedule = _pop_option(sys.argv, '--schedule')
+    if schedule not in (None, 'longest', 'shortest', 'name'):
+        print('Ошибка: --schedule должно быть longest, shortest или name')
+        sys.exit(1)
+    if prefetch is None:
+        prefetch = 2
     resume_time = None
     if '--resume-time' in sys.argv:
         idx = sys.argv.index('--resume-time')
@@ -398,8 +2627,24 @@ if __name__ == '__main__':
         else:
             print('Ошибка: --resume-time требует значение (секунды)')
             sys.exit(1)
+    # The server runs with its own caches, metrics and output settings, a forwarded file would silently ignore these
+    local_only = (metrics is not None or not use_ffmpeg or wav_cache is not None or vad_cache is not None or cache_dir is not None
+                  or stream_threshold is not None or flush_interval is not None or transcriber_kwargs['fsync'])
     try:
-        transcriber = RussianWhisperTranscriber(dry_run=dry_run)
+        # The server writes its own configured formats and models, so only plain requests are sent to it
+        if (use_server and not local_only and not dry_run and resume_time is None and chunks == 1 and output_formats == ['txt']
+                and not transcriber_kwargs['cascade_model']
+                and Path(input_path).is_file() and model_name in _server_models(server_url)):
+            output_file = None
+            for arg in sys.argv[2:]:
+                if not arg.startswith('--'):
+                    output_file = Path(arg)
+                    break
+            # The server only writes .txt results, other names are transcribed locally
+            if output_file is None or output_file.suffix.lower() == '.txt':
+                print(f'Обработка одного файла: {input_path}')
+                sys.exit(0 if _transcribe_via_server(server_url, Path(input_path), output_file, print_segments, model_name) else 1)
+        transcriber = RussianWhisperTranscriber(**transcriber_kwargs)
         # Check if input is a directory or file
         input_path = Path(input_path)
         if input_path.is_dir():
@@ -412,7 +2657,8 @@ if __name__ == '__main__':
                     output_dir = Path(arg)
                     break
             print(f'Обработка папки: \033[92m{input_path}\033[0m')
-            transcriber.batch_transcribe_directory(input_path, output_dir, print_segments=print_segments, dry_run=dry_run)
+            transcriber.batch_transcribe_directory(input_path, output_dir, print_segments=print_segments, dry_run=dry_run, workers=workers, use_ffmpeg=use_ffmpeg, chunks=chunks,
+                prefetch=prefetch, force=force, watch=watch, watch_interval=watch_interval, schedule=schedule)
         elif input_path.is_file():
             output_file = None
             for arg in sys.argv[2:]:
@@ -427,6 +2673,7 @@ if __name__ == '__main__':
                 dry_run=dry_run,
                 resume_time=resume_time or 0,
                 use_ffmpeg=use_ffmpeg,
+                chunks=chunks,
             )
         else:
             print(f'Ошибка: {input_path} не является файлом или папкой')